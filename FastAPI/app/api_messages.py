@@ -0,0 +1,57 @@
+# app/api_messages.py
+
+
+class ApiMessage:
+    """
+    One chat-completion message. `payload` is the dict sent to the API, built once; `tokens` is
+    filled in by TokenCounter.message_tokens the first time the message is counted.
+    """
+
+    __slots__ = ("role", "content", "payload", "tokens")
+
+    def __init__(self, role, content):
+        self.role = role
+        self.content = content
+        self.payload = {"role": role, "content": content}
+        self.tokens = None
+
+
+def api_message(entry):
+    """
+    Transforms one LLMChat history entry into the format expected by OpenAI's Chat Completion API.
+    """
+    kind = entry['type'].lower()
+    if kind == 'system':
+        return ApiMessage("system", entry['content'])
+    if kind == 'user':
+        content = f"[{entry['speaker']}] " + entry['content'] if entry.get('speaker') else entry['content']
+        return ApiMessage("user", content)
+    if kind in ['assistant', 'summary', 'caution']:
+        # All assistant-related types map to 'assistant' role
+        return ApiMessage("assistant", f"[{entry['recipient'].upper()}] " + entry['content'])
+    # Default to 'assistant' role for any other types to prevent errors
+    return ApiMessage("assistant", "[SYSTEM ERROR] " + entry['content'])
+
+
+class ApiMessageLog:
+    """
+    The API form of an append-only history, maintained alongside it: sync() transforms only the
+    entries appended since the last call, so a turn costs O(1) transformation work instead of
+    re-converting the whole conversation. Messages keep their identity across calls, which also
+    makes comparing consecutive prompts cheap.
+    """
+
+    def __init__(self):
+        self.messages = []
+
+    def sync(self, history):
+        """
+        :param history: LLMChat.history.
+        :return: List of ApiMessage, one per history entry.
+        """
+        if len(history) < len(self.messages):
+            # The history was replaced rather than appended to
+            self.messages = []
+        for index in range(len(self.messages), len(history)):
+            self.messages.append(api_message(history[index]))
+        return self.messages
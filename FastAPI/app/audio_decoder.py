@@ -0,0 +1,163 @@
+# app/audio_decoder.py
+
+import io
+import subprocess
+from math import gcd
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
+
+# Containers libsndfile decodes in-process; everything else goes through ffmpeg
+SOUNDFILE_FORMATS = ("wav", "flac", "ogg")
+RAW_PCM_CONTENT_TYPES = ("audio/l16", "audio/pcm", "audio/x-raw")
+
+
+class AudioTooLongError(ValueError):
+    """
+    Raised when decoded audio exceeds the configured maximum duration.
+    """
+
+    def __init__(self, seconds, max_seconds):
+        super().__init__(f"Audio is {seconds:.1f}s long, the maximum is {max_seconds:.0f}s.")
+        self.seconds = seconds
+        self.max_seconds = max_seconds
+
+    def __reduce__(self):
+        # Keeps the exception picklable when it is raised inside the DSP process pool
+        return (AudioTooLongError, (self.seconds, self.max_seconds))
+
+
+def _check_duration(seconds, max_seconds):
+    if max_seconds is not None and seconds > max_seconds:
+        raise AudioTooLongError(seconds, max_seconds)
+
+
+def sniff_format(header):
+    """
+    Identifies the container from the first bytes of a file.
+
+    :param header: At least the first 12 bytes of the upload.
+    :return: One of 'wav', 'flac', 'ogg', 'webm', 'mp4', 'mp3' or 'unknown'.
+    """
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "wav"
+    if header[:4] == b"fLaC":
+        return "flac"
+    if header[:4] == b"OggS":
+        return "ogg"
+    if header[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if header[4:8] == b"ftyp":
+        return "mp4"
+    if header[:3] == b"ID3" or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return "mp3"
+    return "unknown"
+
+
+def _parse_content_type(content_type):
+    """
+    Splits 'audio/L16; rate=16000; channels=1' into ('audio/l16', {'rate': '16000', ...}).
+    """
+    if not content_type:
+        return "", {}
+    parts = [p.strip() for p in content_type.split(";")]
+    params = dict(p.split("=", 1) for p in parts[1:] if "=" in p)
+    return parts[0].lower(), {k.strip().lower(): v.strip() for k, v in params.items()}
+
+
+def resample(audio, orig_rate, target_rate):
+    """
+    Polyphase resampling; a no-op when the rates already match.
+    """
+    if orig_rate == target_rate:
+        return audio
+    divisor = gcd(orig_rate, target_rate)
+    return resample_poly(audio, target_rate // divisor, orig_rate // divisor).astype(np.float32, copy=False)
+
+
+def _to_mono(audio):
+    return audio.mean(axis=1, dtype=np.float32) if audio.ndim == 2 and audio.shape[1] > 1 else audio.reshape(-1)
+
+
+def _read_all(source):
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return f.read()
+    return source.read()
+
+
+def ffmpeg_decode(source, sample_rate=16000, max_seconds=None):
+    """
+    Decodes with a single ffmpeg process: bytes are piped through stdin (no temp file), paths are
+    read directly (needed for MP4 files whose index sits at the end of the file). With
+    `max_seconds`, ffmpeg stops decoding just past the limit.
+    """
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error", "-threads", "0", "-i"]
+    command += [source] if isinstance(source, str) else ["pipe:0"]
+    if max_seconds is not None:
+        command += ["-t", str(max_seconds + 1)]
+    command += ["-f", "f32le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"]
+    try:
+        completed = subprocess.run(
+            command, input=None if isinstance(source, str) else source, capture_output=True, check=True
+        )
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode audio with ffmpeg: {e.stderr.decode(errors='ignore').strip()}") from e
+    return np.frombuffer(completed.stdout, dtype=np.float32).copy()
+
+
+def decode_audio(source, sample_rate=16000, content_type=None, max_seconds=None):
+    """
+    Decodes an upload into mono float32 samples at `sample_rate`.
+
+    WAV/FLAC/Ogg and raw PCM (Content-Type audio/L16) are decoded in-process with soundfile or
+    NumPy; compressed formats such as WebM or M4A fall back to one ffmpeg pipe.
+
+    :param source: Path, bytes or seekable binary file object.
+    :param content_type: The upload's Content-Type, used to recognise headerless PCM.
+    :param max_seconds: Raise AudioTooLongError for longer audio, before decoding when the
+        container header gives the duration.
+    :return: Tuple of (float32 samples, name of the decoder used).
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(bytes(source))
+
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            header = f.read(16)
+    else:
+        position = source.tell()
+        header = source.read(16)
+        source.seek(position)
+
+    media_type, params = _parse_content_type(content_type)
+    container = sniff_format(header)
+
+    if container == "unknown" and media_type in RAW_PCM_CONTENT_TYPES:
+        data = _read_all(source)
+        # RFC 3551 L16 is big-endian; browsers sending audio/pcm use little-endian
+        dtype = ">i2" if media_type == "audio/l16" else "<i2"
+        channels = int(params.get("channels", 1))
+        samples = np.frombuffer(data[: len(data) - len(data) % (2 * channels)], dtype=dtype)
+        _check_duration(len(samples) / channels / int(params.get("rate", sample_rate)), max_seconds)
+        audio = _to_mono(samples.reshape(-1, channels).astype(np.float32) / 32768.0)
+        return resample(audio, int(params.get("rate", sample_rate)), sample_rate), "pcm"
+
+    if container in SOUNDFILE_FORMATS:
+        try:
+            with sf.SoundFile(source) as sound_file:
+                _check_duration(sound_file.frames / sound_file.samplerate, max_seconds)
+                audio = sound_file.read(dtype="float32", always_2d=True)
+                rate = sound_file.samplerate
+            return resample(_to_mono(audio), rate, sample_rate), f"soundfile:{container}"
+        except RuntimeError as e:
+            # e.g. Ogg Opus on older libsndfile builds
+            print(f"soundfile could not decode {container} ({e}), falling back to ffmpeg.")
+            if not isinstance(source, str):
+                source.seek(0)
+
+    data = source if isinstance(source, str) else source.read()
+    audio = ffmpeg_decode(data, sample_rate, max_seconds)
+    _check_duration(len(audio) / sample_rate, max_seconds)
+    return audio, f"ffmpeg:{container}"
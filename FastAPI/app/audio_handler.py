@@ -1,16 +1,41 @@
 # app/audio_handler.py
 
 import os
+import time
+import numpy as np
 import soundfile as sf
-from pydub import AudioSegment, effects
-import noisereduce as nr
 import sounddevice as sd
 import tempfile
 
+from .audio_decoder import decode_audio
+from .noise_reduction import NoiseReducer
+from .speech_gate import level_dbfs
+from .transcription_cache import pcm_digest
+from .vad import VADStats, extract_silence, extract_speech, get_vad
+
+class PreprocessedAudio:
+    """
+    Result of AudioHandler.preprocess_speech: the voiced, denoised audio plus what the pipeline
+    learned and measured along the way (returned as one picklable object from the DSP pool).
+    """
+
+    def __init__(self, audio, vad_stats, noise_profile=None, decoder=None, stage_seconds=None, level_dbfs=None):
+        self.audio = audio
+        self.vad_stats = vad_stats
+        self.level_dbfs = level_dbfs  # RMS level of the decoded clip before normalization
+        self.noise_profile = noise_profile  # Profile learned from this clip's non-speech frames, before normalization
+        self.decoder = decoder
+        self.stage_seconds = stage_seconds if stage_seconds else {}
+
 class AudioHandler:
-    def __init__(self, sample_rate=16000, duration=5):
+    def __init__(self, sample_rate=16000, duration=5, debug_dir=None, vad_mode="energy",
+                 noise_strategy="stationary", noise_n_jobs=1):
         self.sample_rate = sample_rate
         self.duration = duration
+        self.vad_mode = vad_mode  # 'energy', 'silero' or 'off'
+        self.noise_reducer = NoiseReducer(strategy=noise_strategy, sample_rate=sample_rate, n_jobs=noise_n_jobs)
+        # When set, intermediate WAV files are written here for inspection
+        self.debug_dir = debug_dir
 
     def record_audio(self):
         print("Recording...")
@@ -25,20 +50,110 @@ class AudioHandler:
             print(f"Failed to record audio: {e}")
             return None
 
-    def preprocess_audio(self, input_path):
-        normalized_path = "normalized_audio.wav"
-        denoised_path = "denoised_audio.wav"
-        
-        # Normalize Audio
-        audio = AudioSegment.from_file(input_path)
-        normalized_audio = effects.normalize(audio, headroom=-20.0)
-        normalized_audio.export(normalized_path, format="wav")
-        print(f"Normalized audio saved to {normalized_path}")
-
-        # Reduce Noise
-        data, rate = sf.read(normalized_path)
-        reduced_noise = nr.reduce_noise(y=data, sr=rate)
-        sf.write(denoised_path, reduced_noise, rate)
-        print(f"Noise-reduced audio saved to {denoised_path}")
-
-        return denoised_path
+    def decode_upload(self, input_audio, content_type=None, max_seconds=None):
+        """
+        Decodes an upload and hashes the resulting PCM, so that repeated audio can be recognised
+        before any further preprocessing.
+
+        :return: Tuple of (float32 audio, decoder name, PCM digest).
+        """
+        audio, decoder = decode_audio(input_audio, self.sample_rate, content_type, max_seconds)
+        return audio, decoder, pcm_digest(audio)
+
+    def normalization_gain(self, audio, headroom=-20.0):
+        """
+        :return: The linear gain normalize() applies to this audio (1.0 for silence).
+        """
+        peak = np.max(np.abs(audio)) if audio.size else 0.0
+        if peak == 0:
+            return 1.0
+        return float(10 ** (-headroom / 20.0) / peak)
+
+    def normalize(self, audio, headroom=-20.0):
+        """
+        Peak-normalizes the audio with the same semantics as pydub.effects.normalize.
+        """
+        gain = self.normalization_gain(audio, headroom)
+        if gain == 1.0:
+            return audio
+        return np.clip(audio * gain, -1.0, 1.0).astype(np.float32, copy=False)
+
+    def denoise(self, audio, noise_profile=None):
+        return self.noise_reducer.reduce(audio, noise_profile)
+
+    def apply_vad(self, audio):
+        """
+        Splits audio into speech segments and drops the silence between them.
+
+        :return: Tuple of (voiced float32 audio, VADStats).
+        """
+        vad = get_vad(self.vad_mode, self.sample_rate)
+        if vad is None:
+            return audio, VADStats(len(audio), [(0, len(audio))] if len(audio) else [], self.sample_rate)
+        segments = vad.segments(audio)
+        return extract_speech(audio, segments, self.sample_rate), VADStats(len(audio), segments, self.sample_rate)
+
+    def preprocess_speech(self, input_audio, debug_tag=None, noise_profile=None, learn_noise=False, content_type=None,
+                          max_seconds=None):
+        """
+        Decodes, normalizes and denoises audio entirely in memory, trimming silence with the VAD
+        before denoising so that only voiced regions are denoised and passed on to Whisper.
+
+        :param input_audio: Path, bytes or file object to decode, or a float32 array at the handler's sample rate.
+        :param debug_tag: Prefix for debug WAV filenames so concurrent requests do not overwrite each other.
+
+        :param noise_profile: Cached NoiseProfile for the session; estimated from this clip when None.
+        :param learn_noise: Also estimate a profile from this clip's non-speech frames and return it.
+        :param content_type: The upload's Content-Type, needed for headerless PCM.
+        :param max_seconds: Reject longer audio with AudioTooLongError.
+        :return: PreprocessedAudio.
+        """
+        timings = {}
+        started_at = time.perf_counter()
+        decoder = "array"
+        if isinstance(input_audio, np.ndarray):
+            audio = input_audio
+        else:
+            audio, decoder = decode_audio(input_audio, self.sample_rate, content_type, max_seconds)
+        timings["decode"] = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        level = level_dbfs(audio)
+        gain_db = 20.0 * np.log10(self.normalization_gain(audio))
+        normalized_audio = self.normalize(audio)
+        voiced_audio, vad_stats = self.apply_vad(normalized_audio)
+        self._write_debug("voiced_audio.wav", voiced_audio, debug_tag)
+        timings["vad"] = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        learned_profile = None
+        if self.noise_reducer.strategy == "stationary":
+            # Session profiles are kept at the decoded clip's level: peak normalization scales each
+            # clip by a gain that depends on how loudly it was spoken, not on the room's noise
+            if learn_noise and self.vad_mode != "off":
+                silence = extract_silence(audio, vad_stats.segments)
+                if len(silence) >= self.sample_rate // 4:
+                    learned_profile = self.noise_reducer.estimate_profile(silence, quietest_only=False)
+            if learned_profile is not None:
+                noise_profile = noise_profile.merge(learned_profile) if noise_profile is not None else learned_profile
+            if noise_profile is not None:
+                noise_profile = noise_profile.shifted(gain_db)
+            else:
+                # No usable silence: fall back to the quietest frames of the full clip
+                noise_profile = self.noise_reducer.estimate_profile(normalized_audio)
+
+        reduced_noise = voiced_audio
+        if len(voiced_audio):
+            reduced_noise = self.denoise(voiced_audio, noise_profile)
+            self._write_debug("denoised_audio.wav", reduced_noise, debug_tag)
+        timings["denoise"] = time.perf_counter() - started_at
+
+        return PreprocessedAudio(reduced_noise, vad_stats, learned_profile, decoder, timings, level)
+
+    def _write_debug(self, filename, audio, debug_tag=None):
+        if self.debug_dir:
+            if debug_tag:
+                filename = f"{debug_tag}_{filename}"
+            path = os.path.join(self.debug_dir, filename)
+            sf.write(path, audio, self.sample_rate)
+            print(f"Debug audio saved to {path}")
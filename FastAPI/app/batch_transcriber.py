@@ -0,0 +1,221 @@
+# app/batch_transcriber.py
+
+import asyncio
+import time
+from dataclasses import replace
+
+import whisper
+
+from .long_form import plan_chunks
+from .metrics import metrics
+from .transcription_result import TranscriptionResult
+
+
+class _PendingSegment:
+    def __init__(self, audio, options, future):
+        self.audio = audio
+        self.options = options
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchTranscriber:
+    """
+    Coalesces concurrent transcription requests into batched Whisper decodes.
+
+    Requests are queued and a single worker task collects up to `max_batch_size` pending
+    segments, waiting at most `max_wait_ms` after the first one arrives. Each batch is decoded
+    with one `whisper.decode` call on the stacked log-mel tensor and the results are fanned back
+    to the awaiting requests. Up to `max_concurrent_batches` batches (by default one per
+    executor thread) are decoded at once, so a multi-threaded ASR executor is kept busy.
+
+    Audio longer than one 30-second window is split at pauses into independent chunks that are
+    queued like any other segment, so they are decoded in parallel batches and stitched back
+    together (`long_form="parallel"`), or it is passed whole to the sequential
+    `TranscriptionHandler.transcribe` (`long_form="sequential"`).
+    """
+
+    def __init__(self, transcription_handler, max_batch_size=8, max_wait_ms=20, executor=None, long_form="parallel",
+                 min_hint_logprob=-1.0, language_probs=False, word_timestamps=False, max_concurrent_batches=None):
+        self.transcription_handler = transcription_handler
+        self.min_hint_logprob = min_hint_logprob
+        self.language_probs = language_probs  # Attach Whisper's language probabilities to batched results
+        self.word_timestamps = word_timestamps
+        self.long_form = long_form
+        self.executor = executor  # None runs decodes on the event loop's default executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        if max_concurrent_batches is None:
+            # ThreadPoolExecutor does not expose its size publicly; the default executor gets one batch at a time
+            max_concurrent_batches = getattr(executor, "_max_workers", 1) if executor is not None else 1
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self._queue = None
+        self._worker = None
+        self._batch_slots = None
+        self._batch_tasks = set()
+
+    async def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._batch_slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def transcribe(self, audio, options=None, language_hint=None):
+        """
+        Transcribes an audio file path or 16 kHz float32 array.
+
+        With a `language_hint`, Whisper's language-identification pass is skipped and the audio is
+        decoded in the hinted language; if that decode's average log-probability falls below
+        `min_hint_logprob`, or Whisper's language probabilities (when attached) rank another
+        language first, the hint was probably wrong and the audio is decoded again with detection.
+
+        :param audio: Path to an audio file or a NumPy array of samples at 16 kHz.
+        :param options: Optional whisper.DecodingOptions overriding the handler defaults.
+        :param language_hint: Whisper language code expected for this audio.
+        :return: TranscriptionResult.
+        """
+        loop = asyncio.get_running_loop()
+        if isinstance(audio, str):
+            audio = await loop.run_in_executor(self.executor, whisper.load_audio, audio)
+        options = options if options else self.transcription_handler.default_options()
+
+        if language_hint:
+            result = await self._transcribe(loop, audio, replace(options, language=language_hint))
+            # Language ID, when it ran on these features, overrules a confident decode in the wrong language
+            detected = max(result.language_probs, key=result.language_probs.get) if result.language_probs else None
+            confident = result.avg_logprob is not None and result.avg_logprob >= self.min_hint_logprob
+            if confident and detected in (None, language_hint):
+                metrics.increment("language.hint_accepted")
+                result.language_hint, result.hint_accepted = language_hint, True
+                return result
+            metrics.increment("language.hint_fallback")
+            if detected is not None:
+                # Decode in language ID's best guess directly
+                if detected != language_hint:
+                    metrics.increment("language.hint_contradicted")
+                    retry = await self._transcribe(loop, audio, replace(options, language=detected))
+                    retry.language_probs = result.language_probs
+                    result = retry
+                result.language_hint = language_hint
+                return result
+
+        result = await self._transcribe(loop, audio, replace(options, language=None))
+        metrics.increment("language.detected")
+        result.language_hint = language_hint
+        return result
+
+    async def _transcribe(self, loop, audio, options):
+        if self._worker is None or (len(audio) > whisper.audio.N_SAMPLES and self.long_form != "parallel"):
+            metrics.increment("transcription.unbatched")
+            return await loop.run_in_executor(
+                self.executor,
+                self.transcription_handler.transcribe_result,
+                audio,
+                options.language,
+                self.word_timestamps,
+            )
+
+        if len(audio) <= whisper.audio.N_SAMPLES:
+            return TranscriptionResult.from_decoding(
+                await self._enqueue(loop, audio, options), duration=len(audio) / whisper.audio.SAMPLE_RATE
+            )
+
+        chunks = plan_chunks(audio)
+        metrics.increment("transcription.long_form")
+        metrics.observe("transcription.long_form_chunks", len(chunks))
+        results = await asyncio.gather(*(self._enqueue(loop, audio[c.start:c.end], options) for c in chunks))
+        return TranscriptionResult.from_chunks(chunks, results)
+
+    async def _enqueue(self, loop, audio, options):
+        future = loop.create_future()
+        await self._queue.put(_PendingSegment(audio, options, future))
+        metrics.set_gauge("transcription.queue_depth", self.queue_depth)
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for a free slot first, so segments keep accumulating into the next batch meanwhile
+            await self._batch_slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            metrics.set_gauge("transcription.queue_depth", self.queue_depth)
+            task = asyncio.create_task(self._run_batch(loop, batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task):
+        self._batch_tasks.discard(task)
+        self._batch_slots.release()
+        if not task.cancelled() and task.exception() is not None:
+            metrics.increment("transcription.batch_errors")
+            print(f"Transcription batch failed: {task.exception()}")
+
+    async def _run_batch(self, loop, batch):
+        # Segments can only share a forward pass when they share decoding options
+        groups = {}
+        for pending in batch:
+            groups.setdefault(pending.options, []).append(pending)
+
+        for options, group in groups.items():
+            started_at = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(
+                    self.executor,
+                    self.transcription_handler.decode_batch,
+                    [p.audio for p in group],
+                    options,
+                    self.language_probs,
+                    self.word_timestamps,
+                )
+            except Exception as e:
+                for pending in group:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+                metrics.increment("transcription.batch_errors")
+                continue
+
+            finished_at = time.perf_counter()
+            for pending, result in zip(group, results):
+                if not pending.future.done():
+                    pending.future.set_result(result)
+
+            decode_seconds = finished_at - started_at
+            queue_waits = [started_at - p.enqueued_at for p in group]
+            audio_seconds = sum(len(p.audio) for p in group) / whisper.audio.SAMPLE_RATE
+            metrics.increment("transcription.batches")
+            metrics.increment("transcription.batched_segments", len(group))
+            metrics.observe("transcription.batch_size", len(group))
+            metrics.observe("transcription.batch_decode_seconds", decode_seconds)
+            for wait in queue_waits:
+                metrics.observe("transcription.queue_wait_seconds", wait)
+            metrics.record_event("transcription.batches", {
+                "size": len(group),
+                "decode_seconds": round(decode_seconds, 4),
+                "max_queue_wait_seconds": round(max(queue_waits), 4),
+                "audio_seconds": round(audio_seconds, 3),
+                "real_time_factor": round(decode_seconds / audio_seconds, 4) if audio_seconds else None,
+            })
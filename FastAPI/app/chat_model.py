@@ -1,8 +1,15 @@
 # app/chat_model.py
 import openai  # Updated import for OpenAI
-from openai import OpenAI
 import json  # For JSON transformation
 import os
+import time
+
+from .api_messages import ApiMessageLog, api_message
+from .context_window import ContextWindow, TokenCounter
+from .llm_client import llm_clients
+from .metrics import metrics
+from .prompt_templates import prompt_registry
+from .reply_stream import ReplyPrefixParser
 
 class LLMChat:
     def __init__(
@@ -20,6 +27,11 @@ class LLMChat:
         4. Also, I'm going to Hebei province, can you ask the driver for any recommendation for visiting there
         """,
         temperature=0,
+        speaker_tags=False,  # Incoming messages carry a [USER]/[TARGET] tag naming who spoke
+        max_context_tokens=None,  # Prompt token budget per call; None sends the full history
+        keep_turns=6,
+        client=None,  # AsyncOpenAI client; defaults to the process-wide pooled client for base_url
+        response_cache=None,  # ResponseCache for temperature-0 replies; None always calls the model
     ):
         """
         Initializes the LLMChat with OpenAI's API and communication parameters.
@@ -30,59 +42,11 @@ class LLMChat:
         self.country = country
         self.initial_message = initial_message
         self.temperature = temperature
+        self.speaker_tags = speaker_tags
 
-        # Concise system message
-        self.system_content = (
-            f"""You are a multilingual assistant that communicates with a target based on the user's requirements. Your main goal is to minimize the amount of communication between you and the user.
-
-1. **Prefixes and Languages:**
-   - When addressing the target, use `[TARGET]` and communicate in {self.target_language}.
-   - When addressing the user, use `[USER]` and communicate in {self.user_language}.
-
-2. **Behavior:**
-   - Act like a user but speak in the target's language, which is {self.target_language}.
-   - Ensure to communicate requirements to the user or ask the target questions one by one.
-
-3. **Response Rules:**
-   - Always respond in the native language of the person you are addressing:
-     - `[USER]`: {self.user_language}
-     - `[TARGET]`: {self.target_language}
-   - Format all your replies to start with `[USER]`, `[TARGET]`, `[CAUTION]`, or `[SUMMARY]` followed by a space and then the message.
-   - Do not include any additional text, descriptions, markdown notation, or prompts.
-   - Use only the actual message content suitable for Text-to-Speech without any annotations or explanations.
-   - Ensure each reply contains only one prefix and one message, so reply must be in the format of - [PERSON] Content - and nothing else.
- For example, this behavior is incorrect because it has two messages at the same time:
-  [TARGET] 请带我去虹桥火车站，走最快的路线。另外，你能推荐一下河北省哪里好玩？ 
-  [USER] I've communicated your request to the taxi driver. Do you have any further questions?
- The correct way will be only saying the first part intended for target, and wait for his reply before talking back to user:
-  [TARGET] 请带我去虹桥火车站，走最快的路线。另外，你能推荐一下河北省哪里好玩？ 
- Another example of incorrect behavior is the case where you receive a reply from target, but talking to user back to take the toll road:
- Target Message: 是的，当然！你想走收费公路还是免费公路？收费公路将为您节省约 1.5 小时的时间
- Assistant reply: [USER] Please take the toll road to save time.
- Intended behavior is to reply back to target that we will take the toll road, because user is in hurry:
- Target Message: 是的，当然！你想走收费公路还是免费公路？收费公路将为您节省约 1.5 小时的时间
- Assistant reply: [TARGET] 请走收费公路，以节省时间。
-
-4. **Handling Sensitive Topics and Tips:**
-   - **General Sensitive Topics:**
-     - If the user asks about sensitive topics that can be regarded as inappropriate or offensive in {self.country}, raise a caution prefixed with `[CAUTION]` and provide recommendations.
-   - **Handling Gratitude and Tips:**
-     - If the user wants to thank the driver or give a tip, evaluate its appropriateness in {self.country}.
-     - If giving a tip is inappropriate or offensive:
-       - Respond with `[CAUTION]` in {self.user_language}.
-       - Inform the user that giving a tip may not be appropriate in {self.country}.
-       - Suggest alternative ways to express gratitude, such as saying "Thank you for your cooperation."
-     - If giving a tip is appropriate:
-       - Proceed to convey the message prefixed with `[TARGET]` in {self.target_language}.
-
-5. **Requesting Additional Information:**
-   - If the target asks for additional information that you don't know, ask the user about it, starting with `[USER]`.
-
-6. **Conversation Completion:**
-   - When the conversation goal is achieved, notify the user with a concise summary prefixed with `[SUMMARY]`, and finish by asking whether the user has more questions.
-
-"""
-        )
+        # Rendered once per (languages, country) and shared by every session with the same tuple
+        self.system_prompt = prompt_registry.get(user_language, target_language, country, speaker_tags)
+        self.system_content = self.system_prompt.text
 
         # Initialize conversation history with the system message and initial user message
         self.history = [
@@ -90,117 +54,151 @@ class LLMChat:
             {"type": "user", "recipient": "assistant", "content": self.initial_message}
         ]
 
-        # Initialize OpenAI client
-        self.client = OpenAI(
-            base_url=base_url,
-            api_key=api_key
-        )
+        # Sessions share one pooled async client instead of each opening its own connections
+        self.client = client if client else llm_clients.get(base_url, api_key)
+        self.response_cache = response_cache
+
+        # API-format messages are kept alongside the history and only extended as it grows
+        self.api_log = ApiMessageLog()
+        self.counter = TokenCounter(model_name)
+        self._previous_messages = []  # Messages of the last call, to measure the prefix the next one repeats
+
+        # Older turns are folded into a rolling summary once the history outgrows the budget
+        self.context_window = None
+        if max_context_tokens:
+            self.context_window = ContextWindow(
+                max_tokens=max_context_tokens,
+                keep_turns=keep_turns,
+                summarize=self.summarize_turns,
+                counter=self.counter,
+            )
+        self.last_call_stats = {}
 
         print(f"Initialized OpenAI model '{self.model_name}' with base URL '{base_url}'.")
 
-    def prepare_history_for_api(self):
+    def prepare_history_for_api(self, history=None):
         """
         Transforms the internal history format to the format expected by OpenAI's Chat Completion API.
 
+        :param history: Entries to transform; defaults to the whole history (converted incrementally).
         :return: List of messages with 'role' and 'content' keys.
         """
-        api_history = []
-        for msg in self.history:
-            if msg['type'].lower() == 'system':
-                api_message = {
-                    "role": "system",
-                    "content": msg['content']
-                }
-            elif msg['type'].lower() == 'user':
-                api_message = {
-                    "role": "user",
-                    "content": msg['content']
-                }
-            elif msg['type'].lower() in ['assistant', 'summary', 'caution']:
-                # All assistant-related types map to 'assistant' role
-                api_message = {
-                    "role": "assistant",
-                    "content": f"[{msg['recipient'].upper()}] " + msg['content']
-                }
-            else:
-                # Default to 'assistant' role for any other types to prevent errors
-                api_message = {
-                    "role": "assistant",
-                    "content": "[SYSTEM ERROR] " + msg['content']
-                }
-            api_history.append(api_message)
-        return api_history
-
-    def call_model(self):
+        if history is None:
+            return [message.payload for message in self.api_log.sync(self.history)]
+        return [api_message(entry).payload for entry in history]
+
+    async def call_model(self):
         """
         Invokes the OpenAI model with the current conversation history and processes the assistant's response.
         """
         try:
-            # Prepare history in the format expected by OpenAI's API
-            api_messages = self.prepare_history_for_api()
-            print(f'Api history is {api_messages}')
-
-            response = self.client.chat.completions.create(
+            api_messages = await self.prepare_messages()
+            cache_key = self.response_cache_key(api_messages)
+            cached_reply = await self.response_cache.aget(cache_key) if cache_key else None
+            if cached_reply is not None:
+                self.record_usage(api_messages, None, cached=True)
+                print(f'Assistant reply (cached): {cached_reply}')
+                self.record_reply(cached_reply)
+                return
+
+            response = await self.client.chat.completions.create(
                 model=self.model_name,
-                messages=api_messages,
+                messages=[message.payload for message in api_messages],
                 temperature=self.temperature
             )
+            self.record_usage(api_messages, response)
 
             assistant_reply = response.choices[0].message.content.strip()
             print(f'Assistant reply: {assistant_reply}')
+            self.record_reply(assistant_reply)
+            await self.cache_reply(cache_key, assistant_reply)
+        except Exception as e:
+            print(f"Error during model invocation: {e}")
+            # Append a caution message indicating a system error
+            caution_message = "System error occurred during processing."
+            self.history.append({
+                "type": "assistant",
+                "recipient": "User",
+                "content": caution_message
+            })
 
-            message_type, recipient, message = self.extract_message_components(assistant_reply)
-            print(f'Message is {message}, recipient is {recipient}, message type is {message_type}')
-            
-            if message_type and recipient and message:
-                if message_type in ['CAUTION', 'SUMMARY']:
-                    self.history.append({
-                        "type": message_type,
-                        "recipient": "user",
-                        "content": message
-                    })
-                else:
-                    self.history.append({
-                        "type": "assistant",
-                        "recipient": recipient,
-                        "content": message
-                    })
-                
-                # Additional handling based on message_type
-                if message_type == 'TARGET':
-                    # Message intended for target; no immediate action needed
-                    pass
-                elif message_type in ['USER', 'SUMMARY']:
-                    pass
-                    # Message intended for user; prompt for input
-                    # user_input = self.get_user_input(message)
-                    # if user_input is None:  # User chose to quit
-                    #     return
-                    # self.history.append({
-                    #     "type": "user",
-                    #     "recipient": "assistant",
-                    #     "content": user_input
-                    # })
-                    # self.call_model()
-                elif message_type == 'CAUTION':
-                    # Caution messages may not require immediate user input
-                    pass
-                else:
-                    # Handle other message types if necessary
-                    pass
+    async def prepare_messages(self):
+        """
+        The messages to send for the next call: the context window when one is configured,
+        otherwise the whole history.
+
+        :return: List of ApiMessage.
+        """
+        messages = self.api_log.sync(self.history)
+        if self.context_window is not None:
+            api_messages = await self.context_window.build(self.history, messages)
+        else:
+            api_messages = list(messages)
+        print(f'Sending {len(api_messages)} messages')
+        return api_messages
+
+    def response_cache_key(self, api_messages, **options):
+        """
+        :return: Cache key for a call with these messages, or None when the reply must not be
+            cached (no cache for this session, or sampling at a non-zero temperature).
+        """
+        if self.response_cache is None or not self.response_cache.cacheable(self.temperature):
+            return None
+        payloads = [message.payload for message in api_messages]
+        return self.response_cache.key(self.model_name, self.temperature, payloads, **options)
+
+    async def cache_reply(self, cache_key, assistant_reply):
+        # Only well-formed replies are kept; a malformed one is better retried than repeated
+        if cache_key and self.extract_message_components(assistant_reply)[0]:
+            await self.response_cache.aput(cache_key, assistant_reply)
+
+    def record_reply(self, assistant_reply):
+        """
+        Parses a complete assistant reply and appends it to the history.
+        """
+        message_type, recipient, message = self.extract_message_components(assistant_reply)
+        print(f'Message is {message}, recipient is {recipient}, message type is {message_type}')
+
+        if message_type and recipient and message:
+            if message_type in ['CAUTION', 'SUMMARY']:
+                self.history.append({
+                    "type": message_type,
+                    "recipient": "user",
+                    "content": message
+                })
             else:
-                # Invalid format; respond with system error
-                caution_message = "System error: Invalid response format."
-                print(f"Assistant Message: [CAUTION] {caution_message}")
                 self.history.append({
                     "type": "assistant",
-                    "recipient": "User",
-                    "content": caution_message
+                    "recipient": recipient,
+                    "content": message
                 })
-        except Exception as e:
-            print(f"Error during model invocation: {e}")
-            # Append a caution message indicating a system error
-            caution_message = "System error occurred during processing."
+
+            # Additional handling based on message_type
+            if message_type == 'TARGET':
+                # Message intended for target; no immediate action needed
+                pass
+            elif message_type in ['USER', 'SUMMARY']:
+                pass
+                # Message intended for user; prompt for input
+                # user_input = self.get_user_input(message)
+                # if user_input is None:  # User chose to quit
+                #     return
+                # self.history.append({
+                #     "type": "user",
+                #     "recipient": "assistant",
+                #     "content": user_input
+                # })
+                # self.call_model()
+            elif message_type == 'CAUTION':
+                # Caution messages may not require immediate user input
+                pass
+            else:
+                # Handle other message types if necessary
+                pass
+        else:
+            # Invalid format; respond with system error
+            caution_message = "System error: Invalid response format."
+            print(f"Assistant Message: [CAUTION] {caution_message}")
             self.history.append({
                 "type": "assistant",
                 "recipient": "User",
@@ -208,6 +206,82 @@ class LLMChat:
             })
 
 
+    async def summarize_turns(self, previous_summary, turns_text):
+        """
+        Folds conversation turns into the running summary with a short, separate completion.
+
+        :return: The updated summary.
+        """
+        prompt = (
+            "Update the summary of a conversation between a user, an assistant acting for them and a target. "
+            "Keep every fact, request, answer and open question that later replies may depend on, in at most "
+            "120 words, in English.\n\n"
+            f"Current summary:\n{previous_summary or '(none)'}\n\nNew turns:\n{turns_text}"
+        )
+        messages = [{"role": "user", "content": prompt}]
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = self.response_cache.key(self.model_name, 0, messages, max_tokens=300)
+            summary = await self.response_cache.aget(cache_key)
+            if summary is not None:
+                return summary
+        response = await self.client.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            temperature=0,
+            max_tokens=300,
+        )
+        metrics.increment("llm.summarizations")
+        summary = response.choices[0].message.content.strip()
+        if cache_key:
+            await self.response_cache.aput(cache_key, summary)
+        return summary
+
+    def record_usage(self, api_messages, response, cached=False):
+        """
+        Records how many tokens were sent with a call (the API's count when it reports usage).
+
+        :param cached: The reply came from the response cache and no call was made.
+        """
+        stats = dict(self.context_window.last_stats) if self.context_window is not None else {}
+        stats["messages_sent"] = len(api_messages)
+        stats["response_cached"] = cached
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            stats["prompt_tokens"] = usage.prompt_tokens
+            stats["completion_tokens"] = usage.completion_tokens
+            metrics.observe("llm.prompt_tokens", usage.prompt_tokens)
+            metrics.observe("llm.completion_tokens", usage.completion_tokens)
+            cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+            if cached_tokens is not None:
+                stats["cached_tokens"] = cached_tokens
+                metrics.observe("llm.cached_tokens", cached_tokens)
+        stats["cache_eligible_tokens"] = self.cache_eligible_tokens(api_messages)
+        metrics.observe("llm.cache_eligible_tokens", stats["cache_eligible_tokens"])
+        if "prompt_tokens_estimate" in stats:
+            metrics.observe("llm.prompt_tokens_estimate", stats["prompt_tokens_estimate"])
+            metrics.observe("llm.history_tokens_estimate", stats["history_tokens_estimate"])
+        self.last_call_stats = stats
+
+    def cache_eligible_tokens(self, api_messages):
+        """
+        Prompt tokens at the start of a call that were already sent unchanged, i.e. the prefix a
+        provider-side prompt cache can serve: the leading messages shared with this session's
+        previous call, and at least the system prompt once another session has sent it. Providers
+        only cache prompts above a minimum length (1024 tokens for OpenAI).
+        """
+        shared = 0
+        for previous, message in zip(self._previous_messages, api_messages):
+            # Messages are built once per history entry, so an unchanged message is the same object
+            if previous is not message:
+                break
+            shared += 1
+        self._previous_messages = api_messages
+
+        if not shared and self.system_prompt.sessions > 1:
+            shared = 1
+        return self.counter.count_api_messages(api_messages[:shared])
+
     def extract_message_components(self, assistant_reply):
         """
         Extracts the message type, recipient, and content from the assistant's reply.
@@ -231,23 +305,19 @@ class LLMChat:
         print('Invalid format of assistant reply.')
         return None, None, None
 
-    def send_message(self, user_message):
+    async def send_message(self, user_message, speaker=None):
         """
         Accepts a user message, appends it to history, calls the model, and returns the assistant's response.
 
         :param user_message: The message sent by the user.
+        :param speaker: 'USER' or 'TARGET' when the side that spoke the message is known.
         :return: The assistant's reply.
         """
         if user_message.lower() == 'q':
             return "Chat session has been terminated."
 
-        print(f'User Message: {user_message}')
-        self.history.append({
-            "type": "user",
-            "recipient": "assistant",
-            "content": user_message
-        })
-        self.call_model()
+        self.append_user_message(user_message, speaker)
+        await self.call_model()
 
         # Get the latest assistant message
         for msg in reversed(self.history):
@@ -255,6 +325,95 @@ class LLMChat:
                 return msg['content']
         return "No response from assistant."
 
+    def append_user_message(self, user_message, speaker=None):
+        print(f'User Message: {user_message}')
+        message = {
+            "type": "user",
+            "recipient": "assistant",
+            "content": user_message
+        }
+        if speaker and self.speaker_tags:
+            message["speaker"] = speaker
+        self.history.append(message)
+
+    async def stream_message(self, user_message, speaker=None):
+        """
+        Streaming variant of send_message. Yields events while the reply is generated:
+        {"type": "route", "message_type", "recipient"} as soon as the reply prefix is known,
+        {"type": "delta", "content"} for each piece of the message, and finally
+        {"type": "done", "message_type", "recipient", "content"} once the reply is in the history
+        (or {"type": "error", "detail"} if the call failed).
+
+        Closing the generator early (e.g. the client disconnected) closes the upstream stream.
+        """
+        self.append_user_message(user_message, speaker)
+        parser = ReplyPrefixParser()
+        parts = []
+        last_chunk = None
+        stream = None
+        started_at = time.perf_counter()
+        try:
+            api_messages = await self.prepare_messages()
+            cache_key = self.response_cache_key(api_messages)
+            cached_reply = await self.response_cache.aget(cache_key) if cache_key else None
+            if cached_reply is not None:
+                # Replayed as one delta: the whole reply is already known
+                parts.append(cached_reply)
+                for event in parser.feed(cached_reply) + parser.finish():
+                    yield event
+            else:
+                stream = await self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=[message.payload for message in api_messages],
+                    temperature=self.temperature,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                async for chunk in stream:
+                    last_chunk = chunk
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if not delta:
+                        continue
+                    if not parts:
+                        metrics.observe("llm.first_token_seconds", time.perf_counter() - started_at)
+                    parts.append(delta)
+                    for event in parser.feed(delta):
+                        if event["type"] == "route":
+                            metrics.observe("llm.route_seconds", time.perf_counter() - started_at)
+                        yield event
+                for event in parser.finish():
+                    yield event
+        except GeneratorExit:
+            metrics.increment("llm.stream_cancelled")
+            raise
+        except Exception as e:
+            print(f"Error during model invocation: {e}")
+            self.history.append({
+                "type": "assistant",
+                "recipient": "User",
+                "content": "System error occurred during processing."
+            })
+            yield {"type": "error", "detail": str(e)}
+            return
+        finally:
+            if stream is not None:
+                await stream.close()
+
+        # Servers that report usage on streams send it with the last chunk
+        self.record_usage(api_messages, last_chunk, cached=cached_reply is not None)
+        assistant_reply = "".join(parts).strip()
+        if cached_reply is None:
+            metrics.observe("llm.stream_seconds", time.perf_counter() - started_at)
+            await self.cache_reply(cache_key, assistant_reply)
+        self.record_reply(assistant_reply)
+        reply = self.history[-1]
+        yield {
+            "type": "done",
+            "message_type": parser.message_type,
+            "recipient": reply["recipient"],
+            "content": reply["content"],
+        }
+
     def get_history_uppercase(self):
         """
         Returns a copy of the conversation history with all dictionary values converted to uppercase,
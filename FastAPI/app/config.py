@@ -0,0 +1,178 @@
+# app/config.py
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def env_bool(name, default=False):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def env_float(name, default):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def env_list(name, default):
+    value = os.getenv(name)
+    items = [i.strip() for i in value.split(",")] if value else default
+    return list(dict.fromkeys(i for i in items if i))
+
+
+def env_dict(name):
+    """
+    Parses "key=value,key=value" into a dict.
+    """
+    value = os.getenv(name, "")
+    return dict(item.split("=", 1) for item in (i.strip() for i in value.split(",")) if "=" in item)
+
+
+# Whisper model served by the API. Device/dtype default to CUDA + float16 when a GPU is
+# available and CPU + float32 otherwise.
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "large")
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE") or None
+WHISPER_DTYPE = os.getenv("WHISPER_DTYPE") or None
+WHISPER_WARMUP = env_bool("WHISPER_WARMUP", True)
+# Precision per model, e.g. WHISPER_PRECISION_BY_MODEL="large=int8,small=bfloat16"; models
+# not listed use WHISPER_DTYPE (float32, float16, bfloat16 or int8).
+WHISPER_PRECISION_BY_MODEL = env_dict("WHISPER_PRECISION_BY_MODEL")
+
+
+def whisper_dtype_for(model_name):
+    return WHISPER_PRECISION_BY_MODEL.get(model_name, WHISPER_DTYPE)
+
+# Micro-batching of concurrent transcriptions: a batch is dispatched once it holds
+# WHISPER_BATCH_SIZE segments or WHISPER_BATCH_WAIT_MS has passed since the first one arrived.
+WHISPER_BATCH_SIZE = env_int("WHISPER_BATCH_SIZE", 8)
+WHISPER_BATCH_WAIT_MS = env_float("WHISPER_BATCH_WAIT_MS", 20)
+
+# Directory where AudioHandler writes its intermediate WAV files; unset keeps preprocessing
+# entirely in memory.
+AUDIO_DEBUG_DIR = os.getenv("AUDIO_DEBUG_DIR") or None
+
+# Per-request scratch space for uploads. SCRATCH_ROOT defaults to /dev/shm when writable;
+# SCRATCH_IN_MEMORY keeps buffers in process memory instead of files.
+SCRATCH_ROOT = os.getenv("SCRATCH_ROOT") or None
+SCRATCH_IN_MEMORY = env_bool("SCRATCH_IN_MEMORY", False)
+
+# Content-addressed transcription cache (opt-in): transcripts keyed by a hash of the decoded PCM,
+# the model and its decoding options, the language hint and the preprocessing config, so replayed
+# or retried uploads skip preprocessing and Whisper. 0 bytes disables the memory tier;
+# TRANSCRIPTION_CACHE_DIR adds a disk tier. ENCODER_CACHE_BYTES also keeps encoder outputs.
+TRANSCRIPTION_CACHE_BYTES = env_int("TRANSCRIPTION_CACHE_BYTES", 0)
+TRANSCRIPTION_CACHE_DIR = os.getenv("TRANSCRIPTION_CACHE_DIR") or None
+TRANSCRIPTION_CACHE_DISK_BYTES = env_int("TRANSCRIPTION_CACHE_DISK_BYTES", 512 * 1024 * 1024)
+ENCODER_CACHE_BYTES = env_int("ENCODER_CACHE_BYTES", 0)
+
+# Worker pools that keep CPU-bound work off the event loop. When a stage's queue is full,
+# requests are rejected with 503 + Retry-After; a session with too many in-flight audio
+# requests gets 429.
+DSP_WORKERS = env_int("DSP_WORKERS", 0) or None
+DSP_MAX_QUEUE = env_int("DSP_MAX_QUEUE", 16)
+ASR_THREADS = env_int("ASR_THREADS", 2)
+ASR_MAX_CONCURRENCY = env_int("ASR_MAX_CONCURRENCY", 16)
+ASR_MAX_QUEUE = env_int("ASR_MAX_QUEUE", 32)
+LLM_THREADS = env_int("LLM_THREADS", 16)
+LLM_MAX_CONCURRENCY = env_int("LLM_MAX_CONCURRENCY", 64)
+LLM_MAX_QUEUE = env_int("LLM_MAX_QUEUE", 64)
+RETRY_AFTER_SECONDS = env_int("RETRY_AFTER_SECONDS", 2)
+MAX_INFLIGHT_AUDIO_PER_SESSION = env_int("MAX_INFLIGHT_AUDIO_PER_SESSION", 2)
+
+# Streaming transcription over /ws/transcribe: partial results every STREAM_STEP_SECONDS over
+# the trailing STREAM_WINDOW_SECONDS, utterances finalized after STREAM_SILENCE_MS of silence.
+STREAM_WINDOW_SECONDS = env_float("STREAM_WINDOW_SECONDS", 10.0)
+STREAM_STEP_SECONDS = env_float("STREAM_STEP_SECONDS", 1.0)
+STREAM_OVERLAP_SECONDS = env_float("STREAM_OVERLAP_SECONDS", 1.0)
+STREAM_SILENCE_MS = env_int("STREAM_SILENCE_MS", 700)
+
+# Voice-activity detection before Whisper: 'energy', 'silero' (needs torch.hub access) or 'off'.
+VAD_MODE = os.getenv("VAD_MODE", "energy")
+
+# Noise reduction strategy ('stationary', 'nonstationary' or 'bypass') and the number of threads
+# used to denoise chunks of long clips in parallel.
+NOISE_REDUCTION = os.getenv("NOISE_REDUCTION", "stationary")
+NOISE_REDUCTION_JOBS = env_int("NOISE_REDUCTION_JOBS", 1)
+
+# Per-session noise profiles: learned from the first NOISE_PROFILE_LEARN_UTTERANCES utterances,
+# expired after NOISE_PROFILE_TTL_SECONDS idle, at most NOISE_PROFILE_MAX_SESSIONS kept.
+NOISE_PROFILE_LEARN_UTTERANCES = env_int("NOISE_PROFILE_LEARN_UTTERANCES", 3)
+NOISE_PROFILE_TTL_SECONDS = env_int("NOISE_PROFILE_TTL_SECONDS", 1800)
+NOISE_PROFILE_MAX_SESSIONS = env_int("NOISE_PROFILE_MAX_SESSIONS", 1000)
+
+# Upload limits (HTTP 413 when exceeded): the request body is bounded while it streams in, the
+# file and its declared WAV duration again while it is spooled
+MAX_UPLOAD_BYTES = env_int("MAX_UPLOAD_BYTES", 50 * 1024 * 1024)
+MAX_AUDIO_SECONDS = env_float("MAX_AUDIO_SECONDS", 600)
+
+# Recordings longer than 30 s: 'parallel' decodes pause-aligned chunks as batches, 'sequential'
+# uses Whisper's own windowed transcribe.
+LONG_FORM_MODE = os.getenv("LONG_FORM_MODE", "parallel")
+
+# Model tiers, best first. Requests degrade to smaller tiers when the queue of a larger one is
+# saturated (WHISPER_TIER_MAX_QUEUE) or its estimated latency exceeds the client's
+# X-Latency-Budget-Ms header. Tiers not in WHISPER_PRELOAD_TIERS are loaded on first use.
+WHISPER_TIERS = env_list("WHISPER_TIERS", [WHISPER_MODEL, "small", "base"])
+WHISPER_PRELOAD_TIERS = env_list("WHISPER_PRELOAD_TIERS", [WHISPER_TIERS[0]])
+WHISPER_TIER_MAX_QUEUE = env_int("WHISPER_TIER_MAX_QUEUE", 16)
+
+# Turns are decoded in the language expected from the speaker (skipping Whisper's language
+# detection); decodes whose average log-probability falls below this are redone with detection.
+LANGUAGE_HINTS = env_bool("LANGUAGE_HINTS", True)
+LANGUAGE_HINT_MIN_LOGPROB = env_float("LANGUAGE_HINT_MIN_LOGPROB", -1.0)
+
+# Opt-in: tag each turn as USER or TARGET side, transcribed ones from Whisper's language-ID
+# probabilities (one extra decoder step per batch), so LLMChat gets told who spoke instead of
+# inferring it. Changes the system prompt and the messages sent, so it is off by default. The
+# probabilities also let a language hint be overruled when language ID disagrees with it.
+SPEAKER_ROUTING = env_bool("SPEAKER_ROUTING", False)
+
+# Word timings are aligned from the decode's own encoder output (no second decode) and returned
+# with segments and confidences in the /process_audio response.
+WORD_TIMESTAMPS = env_bool("WORD_TIMESTAMPS", True)
+# Whisper's no-speech rule: a clip is silence when no_speech_prob exceeds NO_SPEECH_THRESHOLD and
+# avg_logprob is not above NO_SPEECH_LOGPROB_THRESHOLD. Such clips skip the LLM call.
+NO_SPEECH_THRESHOLD = env_float("NO_SPEECH_THRESHOLD", 0.6)
+NO_SPEECH_LOGPROB_THRESHOLD = env_float("NO_SPEECH_LOGPROB_THRESHOLD", -1.0)
+
+# Speech gate: clips quieter than SPEECH_GATE_MIN_LEVEL_DBFS (RMS, before normalization) or with
+# less than SPEECH_GATE_MIN_SPEECH_SECONDS of voiced audio are rejected before Whisper; clips
+# Whisper judges as no speech are rejected before the LLM. Empty audio/transcripts are always rejected.
+SPEECH_GATE = env_bool("SPEECH_GATE", True)
+SPEECH_GATE_MIN_LEVEL_DBFS = env_float("SPEECH_GATE_MIN_LEVEL_DBFS", -55.0)
+SPEECH_GATE_MIN_SPEECH_SECONDS = env_float("SPEECH_GATE_MIN_SPEECH_SECONDS", 0.25)
+
+# LLMChat context window: the system prompt, the objective and the last LLM_CONTEXT_KEEP_TURNS
+# turns are sent verbatim, older turns as a rolling summary, within LLM_CONTEXT_MAX_TOKENS
+# prompt tokens per call. 0 sends the full history.
+LLM_CONTEXT_MAX_TOKENS = env_int("LLM_CONTEXT_MAX_TOKENS", 3000)
+LLM_CONTEXT_KEEP_TURNS = env_int("LLM_CONTEXT_KEEP_TURNS", 6)
+
+# OpenAI-compatible chat endpoint used by LLMChat. Point LLM_BASE_URL at tools/fake_openai_server.py
+# (e.g. http://127.0.0.1:8001/v1) to exercise the chat and streaming endpoints offline.
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.gpts.vin/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+
+# Connection pool shared by all sessions' LLM calls. HTTP/2 is negotiated when the h2 package is
+# installed (pip install httpx[http2]).
+LLM_MAX_CONNECTIONS = env_int("LLM_MAX_CONNECTIONS", 64)
+LLM_MAX_KEEPALIVE_CONNECTIONS = env_int("LLM_MAX_KEEPALIVE_CONNECTIONS", 32)
+LLM_KEEPALIVE_SECONDS = env_float("LLM_KEEPALIVE_SECONDS", 60.0)
+LLM_TIMEOUT_SECONDS = env_float("LLM_TIMEOUT_SECONDS", 60.0)
+LLM_HTTP2 = env_bool("LLM_HTTP2", True)
+
+# Opt-in cache of temperature-0 chat replies, keyed by model, temperature and the normalized
+# messages: identical requests (e.g. the same objective and opening reply across sessions) skip
+# the API call. 0 entries disables it; RESPONSE_CACHE_SQLITE_PATH adds a persistent tier.
+RESPONSE_CACHE_ENTRIES = env_int("RESPONSE_CACHE_ENTRIES", 0)
+RESPONSE_CACHE_TTL_SECONDS = env_int("RESPONSE_CACHE_TTL_SECONDS", 3600)
+RESPONSE_CACHE_SQLITE_PATH = os.getenv("RESPONSE_CACHE_SQLITE_PATH") or None
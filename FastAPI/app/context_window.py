@@ -0,0 +1,192 @@
+# app/context_window.py
+
+from functools import lru_cache
+
+from .api_messages import ApiMessage
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to a character-based estimate
+    tiktoken = None
+
+MESSAGE_OVERHEAD_TOKENS = 4  # Role and separators added by the chat format
+
+
+@lru_cache(maxsize=None)
+def _encoding(model_name):
+    # Resolved once per process and model: encodings are downloaded on first use
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"Falling back to estimated token counts: {e}")
+        return None
+
+
+class TokenCounter:
+    """
+    Counts tokens with tiktoken when it is installed, otherwise estimates them: about four
+    characters per token for alphabetic scripts and one token per CJK character.
+    """
+
+    def __init__(self, model_name="gpt-4o-mini"):
+        self.encoding = _encoding(model_name)
+
+    def count(self, text):
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        cjk = sum(1 for ch in text if "぀" <= ch <= "鿿" or "가" <= ch <= "힯")
+        return cjk + (len(text) - cjk + 3) // 4
+
+    def count_messages(self, messages):
+        return sum(self.count(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+    def message_tokens(self, message):
+        """
+        Tokens of an ApiMessage, counted once and kept on the message.
+        """
+        if message.tokens is None:
+            message.tokens = self.count(message.content) + MESSAGE_OVERHEAD_TOKENS
+        return message.tokens
+
+    def count_api_messages(self, messages):
+        return sum(self.message_tokens(m) for m in messages)
+
+
+def format_turns(turns):
+    lines = []
+    for turn in turns:
+        for entry in turn:
+            if entry["type"].lower() == "user":
+                lines.append(f"{entry.get('speaker', 'USER')}: {entry['content']}")
+            else:
+                lines.append(f"ASSISTANT to {entry['recipient'].upper()}: {entry['content']}")
+    return "\n".join(lines)
+
+
+class ContextWindow:
+    """
+    Bounds the messages LLMChat sends per call.
+
+    The system prompt and the opening objective message are always sent, followed by a summary
+    of older turns and the last `keep_turns` turns verbatim. Turns that leave the verbatim window
+    are folded into the summary `fold_every` at a time (one summarization call per fold, not per
+    turn); if the messages still exceed `max_tokens`, more of the oldest turns are folded, down
+    to the latest one.
+
+    Turn boundaries and the history's token total are tracked as entries are appended, so
+    building a call only touches the messages actually sent.
+
+    :param max_tokens: Prompt token budget per call.
+    :param keep_turns: Number of most recent turns always sent verbatim (budget permitting).
+    :param fold_every: Older turns accumulated before the summary is updated.
+    :param summarize: Async callable (previous_summary, turns_text) -> updated summary; when None
+        or failing, older turns are condensed extractively.
+    :param prefix_entries: History entries at the start that are always sent (system prompt and objective).
+    """
+
+    def __init__(self, max_tokens=3000, keep_turns=6, fold_every=4, summarize=None, counter=None, prefix_entries=2,
+                 max_summary_chars=2000):
+        self.max_tokens = max_tokens
+        self.keep_turns = keep_turns
+        self.fold_every = fold_every
+        self.summarize = summarize
+        self.counter = counter if counter else TokenCounter()
+        self.prefix_entries = prefix_entries
+        self.max_summary_chars = max_summary_chars
+        self.summary = ""
+        self.summary_message = None  # ApiMessage carrying the summary; replaced on each fold
+        self.summary_tokens = 0
+        self.summarized_turns = 0  # Turns of the history already folded into the summary
+        self.last_stats = {}
+        self._turn_starts = []  # History index at which each turn starts
+        self._scanned = 0  # History entries already scanned for turn starts
+        self._history_tokens = 0
+
+    async def build(self, history, messages):
+        """
+        :param history: LLMChat.history.
+        :param messages: ApiMessage for each history entry (ApiMessageLog.sync).
+        :return: List of ApiMessage to send.
+        """
+        self._scan(history, messages)
+        turns = len(self._turn_starts)
+
+        pending = turns - self.keep_turns - self.summarized_turns
+        if pending >= self.fold_every:
+            await self._fold(history, turns - self.keep_turns)
+
+        selected = self._assemble(messages)
+        prefix = messages[:self.prefix_entries]
+        if self.counter.count_api_messages(selected) > self.max_tokens and self.summarized_turns < turns - 1:
+            # Fold just enough of the oldest verbatim turns in one go, reserving room for the summary
+            available = self.max_tokens - self.counter.count_api_messages(prefix) - self.max_summary_chars // 4
+            sizes = [
+                self.counter.count_api_messages(messages[self._turn_start(i):self._turn_start(i + 1, len(history))])
+                for i in range(self.summarized_turns, turns)
+            ]
+            upto = turns - 1
+            while upto > self.summarized_turns and sum(sizes[upto - 1 - self.summarized_turns:]) <= available:
+                upto -= 1
+            await self._fold(history, upto)
+            selected = self._assemble(messages)
+
+        self.last_stats = {
+            "prompt_tokens_estimate": self.counter.count_api_messages(selected),
+            "history_tokens_estimate": self._history_tokens,
+            "turns_sent": turns - self.summarized_turns,
+            "turns_summarized": self.summarized_turns,
+            "summary_tokens": self.summary_tokens,
+        }
+        return selected
+
+    def _scan(self, history, messages):
+        if len(history) < self._scanned:
+            # The history was replaced rather than appended to
+            self._turn_starts, self._scanned, self._history_tokens = [], 0, 0
+            self.summary, self.summary_message, self.summary_tokens, self.summarized_turns = "", None, 0, 0
+        for index in range(self._scanned, len(history)):
+            self._history_tokens += self.counter.message_tokens(messages[index])
+            if index >= self.prefix_entries and (history[index]["type"].lower() == "user" or not self._turn_starts):
+                self._turn_starts.append(index)
+        self._scanned = len(history)
+
+    def _turn_start(self, turn, default=None):
+        return self._turn_starts[turn] if turn < len(self._turn_starts) else default
+
+    def _assemble(self, messages):
+        # Most stable first (shared system prompt, objective, summary, append-only turns), so
+        # consecutive calls repeat the longest possible prefix for provider-side prompt caching
+        selected = messages[:self.prefix_entries]
+        if self.summary_message is not None:
+            selected.append(self.summary_message)
+        start = self._turn_start(self.summarized_turns)
+        if start is not None:
+            selected.extend(messages[start:])
+        return selected
+
+    async def _fold(self, history, upto):
+        """
+        Folds turns [summarized_turns, upto) into the summary.
+        """
+        if upto <= self.summarized_turns:
+            return
+        bounds = self._turn_starts[self.summarized_turns:upto] + [self._turn_start(upto, len(history))]
+        text = format_turns([history[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)])
+        summary = None
+        if self.summarize is not None:
+            try:
+                summary = await self.summarize(self.summary, text)
+            except Exception as e:
+                print(f"Summarization failed, condensing turns instead: {e}")
+        if not summary:
+            summary = f"{self.summary}\n{text}".strip() if self.summary else text
+        # Extractive summaries keep the most recent part when they outgrow their budget
+        self.summary = summary[-self.max_summary_chars:]
+        self.summary_message = ApiMessage("system", f"Summary of the earlier conversation:\n{self.summary}")
+        self.summary_tokens = self.counter.count(self.summary)
+        self.summarized_turns = upto
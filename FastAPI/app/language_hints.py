@@ -0,0 +1,19 @@
+# app/language_hints.py
+
+from whisper.tokenizer import LANGUAGES, TO_LANGUAGE_CODE
+
+# Codes used elsewhere in the app (see utils.LANGUAGE_CODE_MAP) that differ from Whisper's
+LANGUAGE_ALIASES = {"cn": "zh", "rs": "ru", "in": "id", "mandarin": "zh", "cantonese": "yue"}
+
+
+def whisper_language_code(language):
+    """
+    Maps a language name or code ('Chinese', 'zh', 'cn') to Whisper's language code, or None.
+    """
+    if not language:
+        return None
+    key = language.strip().lower()
+    key = LANGUAGE_ALIASES.get(key, key)
+    if key in LANGUAGES:
+        return key
+    return TO_LANGUAGE_CODE.get(key)
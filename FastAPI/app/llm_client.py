@@ -0,0 +1,94 @@
+# app/llm_client.py
+
+import httpx
+from openai import AsyncOpenAI
+
+try:
+    import h2  # noqa: F401  HTTP/2 support for httpx
+except ImportError:  # Connections fall back to HTTP/1.1 keep-alive
+    h2 = None
+
+from .metrics import metrics
+
+
+class LLMClientPool:
+    """
+    Process-wide AsyncOpenAI clients, one per (base_url, api_key), all sharing a single httpx
+    connection pool. Sessions reuse warm keep-alive connections (multiplexed over HTTP/2 when the
+    h2 package is installed and the server negotiates it) instead of each opening its own pool
+    and TLS handshakes.
+
+    :param max_connections: Upper bound on open connections across all sessions.
+    :param max_keepalive_connections: Idle connections kept open for reuse.
+    :param keepalive_seconds: How long an idle connection is kept.
+    :param timeout: Per-request timeout in seconds.
+    :param http2: Negotiate HTTP/2 when available.
+    """
+
+    def __init__(self, max_connections=64, max_keepalive_connections=32, keepalive_seconds=60.0, timeout=60.0,
+                 http2=True):
+        self.configure(max_connections, max_keepalive_connections, keepalive_seconds, timeout, http2)
+        self._http_client = None
+        self._clients = {}
+
+    def configure(self, max_connections=64, max_keepalive_connections=32, keepalive_seconds=60.0, timeout=60.0,
+                  http2=True):
+        """
+        Applies pool settings; clients already created keep theirs until aclose().
+        """
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_seconds = keepalive_seconds
+        self.timeout = timeout
+        self.http2 = http2 and h2 is not None
+
+    @property
+    def http_client(self):
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_seconds,
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=min(10.0, self.timeout)),
+            )
+            print(
+                f"Created shared LLM connection pool (max {self.max_connections} connections, "
+                f"HTTP/2 {'on' if self.http2 else 'off'})."
+            )
+        return self._http_client
+
+    def get(self, base_url, api_key):
+        """
+        :return: The shared AsyncOpenAI client for this endpoint and key.
+        """
+        key = (base_url, api_key)
+        client = self._clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(base_url=base_url, api_key=api_key, http_client=self.http_client)
+            self._clients[key] = client
+            metrics.set_gauge("llm.clients", len(self._clients))
+        return client
+
+    async def aclose(self):
+        """
+        Closes the pool's connections; called on application shutdown.
+        """
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        self._http_client = None
+        self._clients = {}
+
+    def stats(self):
+        return {
+            "clients": len(self._clients),
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "http2": self.http2,
+        }
+
+
+# Shared by every session in the process
+llm_clients = LLMClientPool()
@@ -0,0 +1,80 @@
+# app/long_form.py
+
+import whisper
+
+from .utils import join_transcripts, merge_overlapping_text
+from .vad import EnergyVAD
+
+
+class ChunkPlan:
+    """
+    One independently decodable piece of a long recording.
+    """
+
+    def __init__(self, start, end, overlaps_previous):
+        self.start = start
+        self.end = end
+        self.overlaps_previous = overlaps_previous  # True for hard splits inside speech
+
+
+def plan_chunks(audio, sample_rate=16000, max_chunk_seconds=28.0, search_seconds=5.0, overlap_seconds=1.0, vad=None):
+    """
+    Splits audio into chunks no longer than one Whisper window, cutting at pauses.
+
+    Each cut is placed at the quietest VAD frame within the last `search_seconds` before the
+    chunk limit. If that frame is still voiced (no pause to cut at), the chunk is split at the
+    limit and the next chunk starts `overlap_seconds` earlier, so that no word is lost; the
+    duplicated words are removed when stitching.
+
+    :return: List of ChunkPlan.
+    """
+    vad = vad if vad else EnergyVAD(sample_rate)
+    max_samples = min(int(max_chunk_seconds * sample_rate), whisper.audio.N_SAMPLES)
+    if len(audio) <= max_samples:
+        return [ChunkPlan(0, len(audio), False)]
+
+    levels = vad.frame_levels(audio)
+    voiced = vad.speech_frames(audio)
+    frame = vad.frame_samples
+    search = int(search_seconds * sample_rate)
+    overlap = int(overlap_seconds * sample_rate)
+
+    chunks = []
+    start, overlaps_previous = 0, False
+    while len(audio) - start > max_samples:
+        limit = start + max_samples
+        first_frame, last_frame = (limit - search) // frame, limit // frame
+        candidates = levels[first_frame:last_frame]
+        quietest = first_frame + int(candidates.argmin()) if len(candidates) else last_frame
+        if len(candidates) and not voiced[quietest]:
+            cut = quietest * frame + frame // 2
+            chunks.append(ChunkPlan(start, cut, overlaps_previous))
+            start, overlaps_previous = cut, False
+        else:
+            chunks.append(ChunkPlan(start, limit, overlaps_previous))
+            start, overlaps_previous = limit - overlap, True
+    chunks.append(ChunkPlan(start, len(audio), overlaps_previous))
+    return chunks
+
+
+def stitch_chunks(chunks, texts, sample_rate=16000):
+    """
+    Joins per-chunk transcripts, removing words repeated across overlapping chunks.
+
+    :return: Dict with the full 'text' and per-chunk 'segments' carrying absolute timestamps.
+    """
+    segments = []
+    previous_text = ""
+    for chunk, text in zip(chunks, texts):
+        text = text.strip()
+        if chunk.overlaps_previous and previous_text:
+            text = merge_overlapping_text(previous_text, text)
+        if text:
+            segments.append({
+                "start": round(chunk.start / sample_rate, 3),
+                "end": round(chunk.end / sample_rate, 3),
+                "text": text,
+            })
+            previous_text = text
+    return {"text": join_transcripts(s["text"] for s in segments), "segments": segments}
+
@@ -1,24 +1,43 @@
 # app/main.py
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Header, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-import os
-import tempfile
+from typing import Optional
 import uvicorn
+import asyncio
 from uuid import uuid4
 import json
 
 from .models import SessionState
 from .audio_handler import AudioHandler
-from .transcription_handler import TranscriptionHandler
+from .model_registry import model_registry
+from .model_router import ModelTier, ModelTierRouter
+from .metrics import metrics
+from .scratch_space import ScratchSpace
+from .noise_profile_cache import noise_profile_cache
+from .transcription_cache import transcription_cache, encoder_feature_cache
+from .response_cache import response_cache
+from .speech_gate import SpeechGate
+from .upload_ingest import MULTIPART_OVERHEAD_BYTES, spool_upload, UploadLimitMiddleware, UploadTooLargeError
+from .audio_decoder import AudioTooLongError
+from .worker_pools import WorkerPools, OverloadedError
+from .streaming_transcriber import StreamingTranscriber, create_decoder
 from .conversation_manager import ConversationManager
 from .summary_generator import SummaryGenerator
 from .utils import initialize_language_model
 from .schemas import ObjectiveRequest, MessageRequest  # Import the new MessageRequest
 from .chat_model import LLMChat
+from .llm_client import llm_clients
+from .prompt_templates import prompt_registry
+from . import config
 
 app = FastAPI()
 
+# Oversized audio uploads are refused while the body streams in, before Starlette spools it.
+# Added first so that CORS (added last, outermost) also applies to its 413 responses
+app.add_middleware(UploadLimitMiddleware, max_body_bytes=config.MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES)
+
 # Allow CORS
 app.add_middleware(
     CORSMiddleware,
@@ -32,21 +51,118 @@ app.add_middleware(
 @app.on_event("startup")
 def startup_event():
     global llm
+    noise_profile_cache.max_sessions = config.NOISE_PROFILE_MAX_SESSIONS
+    noise_profile_cache.ttl_seconds = config.NOISE_PROFILE_TTL_SECONDS
+    noise_profile_cache.learn_utterances = config.NOISE_PROFILE_LEARN_UTTERANCES
+    transcription_cache.configure(
+        config.TRANSCRIPTION_CACHE_BYTES, config.TRANSCRIPTION_CACHE_DIR, config.TRANSCRIPTION_CACHE_DISK_BYTES
+    )
+    encoder_feature_cache.configure(config.ENCODER_CACHE_BYTES)
+    response_cache.configure(
+        config.RESPONSE_CACHE_ENTRIES, config.RESPONSE_CACHE_TTL_SECONDS, config.RESPONSE_CACHE_SQLITE_PATH
+    )
+    llm_clients.configure(
+        max_connections=config.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_seconds=config.LLM_KEEPALIVE_SECONDS,
+        timeout=config.LLM_TIMEOUT_SECONDS,
+        http2=config.LLM_HTTP2,
+    )
     llm = initialize_language_model()
 
+# Load the resident Whisper tiers once at startup, shared by all requests
+@app.on_event("startup")
+async def start_workers():
+    global worker_pools, model_router, batch_transcriber
+    worker_pools = WorkerPools(
+        dsp_workers=config.DSP_WORKERS,
+        dsp_max_queue=config.DSP_MAX_QUEUE,
+        asr_threads=config.ASR_THREADS,
+        asr_max_concurrency=config.ASR_MAX_CONCURRENCY,
+        asr_max_queue=config.ASR_MAX_QUEUE,
+        llm_threads=config.LLM_THREADS,
+        llm_max_concurrency=config.LLM_MAX_CONCURRENCY,
+        llm_max_queue=config.LLM_MAX_QUEUE,
+        retry_after=config.RETRY_AFTER_SECONDS,
+    )
+    model_router = ModelTierRouter(
+        [
+            ModelTier(
+                model_name,
+                device=config.WHISPER_DEVICE,
+                dtype=config.whisper_dtype_for(model_name),
+                batch_size=config.WHISPER_BATCH_SIZE,
+                batch_wait_ms=config.WHISPER_BATCH_WAIT_MS,
+                executor=worker_pools.asr_executor,
+                long_form=config.LONG_FORM_MODE,
+                max_queue_depth=config.WHISPER_TIER_MAX_QUEUE,
+                warm_up=config.WHISPER_WARMUP,
+                min_hint_logprob=config.LANGUAGE_HINT_MIN_LOGPROB,
+                language_probs=config.SPEAKER_ROUTING,
+                word_timestamps=config.WORD_TIMESTAMPS,
+            )
+            for model_name in config.WHISPER_TIERS
+        ],
+        preload=config.WHISPER_PRELOAD_TIERS,
+    )
+    await model_router.start()
+    # Streaming transcription always uses the primary tier
+    batch_transcriber = await model_router.primary.ensure_loaded()
+
+@app.on_event("shutdown")
+async def stop_workers():
+    await model_router.stop()
+    worker_pools.shutdown()
+    await llm_clients.aclose()
+
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 # In-memory session storage (use a database in production)
 sessions = {}
 
+speech_gate = SpeechGate(
+    min_level_dbfs=config.SPEECH_GATE_MIN_LEVEL_DBFS,
+    min_speech_seconds=config.SPEECH_GATE_MIN_SPEECH_SECONDS,
+    no_speech_threshold=config.NO_SPEECH_THRESHOLD,
+    logprob_threshold=config.NO_SPEECH_LOGPROB_THRESHOLD,
+    enabled=config.SPEECH_GATE,
+)
+
+def rejected_response(decision, vad, model=None, transcription=None):
+    """
+    Fast response for a clip the speech gate rejected; no LLM call was made.
+    """
+    response = {"user_text": "", "assistant_response": None, "rejected": decision.to_dict(), "vad": vad}
+    if model:
+        response["model"] = model
+    if transcription is not None:
+        response["transcription"] = transcription.to_dict()
+    return response
+
 @app.post("/set_objective")
 def set_objective(request: ObjectiveRequest):
     session_id = str(uuid4())
-    session = SessionState(objective=request.objective, target_language=request.target_language)
+    session = SessionState(
+        objective=request.objective,
+        target_language=request.target_language,
+        session_id=session_id,
+        user_language=request.user_language,
+        country=request.country,
+        speaker_routing=config.SPEAKER_ROUTING,
+        bypass_response_cache=request.bypass_response_cache,
+    )
     session.initialize_chat()  # Initialize LLMChat
     sessions[session_id] = session
     return {"session_id": session_id, "message": "Objective and target language set successfully."}
 
 @app.post("/send_message/{session_id}")
-def send_message(session_id: str, request: MessageRequest):
+async def send_message(session_id: str, request: MessageRequest):
     session = sessions.get(session_id)
     if not session:
         raise HTTPException(status_code=400, detail="Invalid session ID.")
@@ -54,61 +170,335 @@ def send_message(session_id: str, request: MessageRequest):
     if not session.chat_model:
         session.initialize_chat()
 
-    assistant_response = session.chat_model.send_message(request.message)
-    session.add_interaction(user_text=request.message, assistant_response=assistant_response)
+    # One turn at a time per session: the reply and the history must belong to this message
+    async with session.chat_lock:
+        async with worker_pools.llm.slot():
+            assistant_response = await session.chat_model.send_message(
+                request.message, speaker=session.message_speaker(request.speaker)
+            )
+        session.add_interaction(user_text=request.message, assistant_response=assistant_response)
 
-    # Check if the conversation is fulfilled based on the assistant's response
-    if "fulfilled" in assistant_response.lower() or session.chat_model.history[-1]['type'] == 'SUMMARY':
-        session.update_status('fulfilled')
+        # Check if the conversation is fulfilled based on the assistant's response
+        if "fulfilled" in assistant_response.lower() or session.chat_model.history[-1]['type'] == 'SUMMARY':
+            session.update_status('fulfilled')
 
-    return {
-        "assistant_response": assistant_response,
-        "history": json.loads(session.chat_model.get_history_json())
-    }
+        return {
+            "assistant_response": assistant_response,
+            "history": json.loads(session.chat_model.get_history_json()),
+            "llm_usage": session.chat_model.last_call_stats,
+        }
 
+def sse_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
 
-@app.post("/process_audio/{session_id}")
-async def process_audio(session_id: str, file: UploadFile = File(...)):
+@app.post("/send_message_stream/{session_id}")
+async def send_message_stream(session_id: str, request: MessageRequest):
+    """
+    Like /send_message, but streams the reply as server-sent events: "route" (message_type and
+    recipient, as soon as the reply prefix has been generated), "delta" events with the message
+    text, then "done" with the complete message, or "error".
+    """
     session = sessions.get(session_id)
     if not session:
         raise HTTPException(status_code=400, detail="Invalid session ID.")
 
+    if not session.chat_model:
+        session.initialize_chat()
+
+    # The session's turn lock is held until the reply is recorded. Admission happens before the
+    # response starts, so a saturated LLM stage still answers 503
+    await session.chat_lock.acquire()
+    slot = worker_pools.llm.slot()
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmpfile:
-            tmpfile.write(await file.read())
-            input_audio_path = tmpfile.name
+        await slot.__aenter__()
+    except BaseException:
+        session.chat_lock.release()
+        raise
+
+    async def events():
+        replies = session.chat_model.stream_message(request.message, speaker=session.message_speaker(request.speaker))
+        try:
+            async for event in replies:
+                if event["type"] == "done":
+                    session.add_interaction(user_text=request.message, assistant_response=event["content"])
+                    if "fulfilled" in event["content"].lower() or event["message_type"] == "SUMMARY":
+                        session.update_status('fulfilled')
+                yield sse_event(event)
+        finally:
+            # Also reached when the client disconnects: closing the generator closes the upstream stream
+            await replies.aclose()
+            await slot.__aexit__(None, None, None)
+            session.chat_lock.release()
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/process_audio/{session_id}")
+async def process_audio(
+    session_id: str,
+    file: UploadFile = File(...),
+    x_latency_budget_ms: Optional[int] = Header(None),
+):
+    session = sessions.get(session_id)
+    if not session:
+        raise HTTPException(status_code=400, detail="Invalid session ID.")
+
+    if session.inflight_audio >= config.MAX_INFLIGHT_AUDIO_PER_SESSION:
+        metrics.increment("process_audio.rate_limited")
+        raise HTTPException(
+            status_code=429,
+            detail="Too many audio requests in flight for this session.",
+            headers={"Retry-After": str(config.RETRY_AFTER_SECONDS)},
+        )
 
-        audio_handler = AudioHandler(duration=5, sample_rate=16000)
-        denoised_audio = audio_handler.preprocess_audio(input_audio_path)
+    session.inflight_audio += 1
+    try:
+        cached, decoder = None, None
+        language_hint = session.language_hint() if config.LANGUAGE_HINTS else None
+        # Besides the model's own options, what else shapes the transcript of the same PCM
+        cache_options = (language_hint, config.VAD_MODE, config.NOISE_REDUCTION)
+        # Per-request scratch space: unique buffers, removed even if preprocessing fails
+        with ScratchSpace(root=config.SCRATCH_ROOT, in_memory=config.SCRATCH_IN_MEMORY) as scratch:
+            upload = scratch.buffer("upload")
+            await spool_upload(file, upload, config.MAX_UPLOAD_BYTES, config.MAX_AUDIO_SECONDS)
+            # Preprocessing runs in the DSP process pool, which receives the tmpfs path (or a view of the buffer)
+            source = scratch.source(upload)
 
-        transcription_handler = TranscriptionHandler()
-        user_text = transcription_handler.transcribe(denoised_audio)
+            audio_handler = AudioHandler(
+                duration=5,
+                sample_rate=16000,
+                debug_dir=config.AUDIO_DEBUG_DIR,
+                vad_mode=config.VAD_MODE,
+                noise_strategy=config.NOISE_REDUCTION,
+                noise_n_jobs=config.NOISE_REDUCTION_JOBS,
+            )
+            if transcription_cache.enabled:
+                # Decode and hash first, so replayed or retried audio skips preprocessing and Whisper
+                source, decoder, audio_digest = await worker_pools.dsp.run(
+                    audio_handler.decode_upload, source, file.content_type, config.MAX_AUDIO_SECONDS
+                )
+                # Only full-quality transcripts are cached; a degraded tier's must not outlive the overload
+                cached = transcription_cache.get(audio_digest, [model_router.primary.cache_variant], cache_options)
+            if cached is None:
+                preprocessed = await worker_pools.dsp.run(
+                    audio_handler.preprocess_speech,
+                    source,
+                    debug_tag=scratch.id,
+                    noise_profile=session.noise_profile,
+                    learn_noise=session.learning_noise_profile,
+                    content_type=file.content_type,
+                    max_seconds=config.MAX_AUDIO_SECONDS,
+                )
+                session.update_noise_profile(preprocessed.noise_profile)
 
         # Use the chat model to get assistant response
         if not session.chat_model:
             session.initialize_chat()
-        
-        assistant_response = session.chat_model.send_message(user_text)
-        session.add_interaction(user_text=user_text, assistant_response=assistant_response)
 
-        os.remove(input_audio_path)
-        os.remove(denoised_audio)
+        if cached is not None:
+            transcription, model_tier, vad = cached["transcription"], cached["model"], cached["vad"]
+        else:
+            denoised_audio, vad_stats = preprocessed.audio, preprocessed.vad_stats
+            metrics.increment(f"decode.{decoder or preprocessed.decoder}")
+            for stage, seconds in preprocessed.stage_seconds.items():
+                metrics.observe(f"preprocess.{stage}_seconds", seconds)
+            metrics.observe("vad.skipped_seconds", vad_stats.skipped_seconds)
+            metrics.increment("vad.skipped_seconds_total", vad_stats.skipped_seconds)
+            metrics.increment("vad.total_seconds_total", vad_stats.total_seconds)
+            vad = vad_stats.to_dict()
+            decision = speech_gate.check_audio(preprocessed.level_dbfs, vad_stats)
+            if not decision.passed:
+                # Nothing but silence or noise: no transcription or LLM call is needed
+                return rejected_response(decision, vad)
+
+            async with worker_pools.asr.slot():
+                transcription, model_tier = await model_router.transcribe(
+                    denoised_audio, latency_budget_ms=x_latency_budget_ms, language_hint=language_hint
+                )
+            # Whisper heard only the voiced segments; report times in the uploaded clip
+            transcription.map_times(vad_stats.clip_time)
+            if transcription_cache.enabled and model_tier == model_router.primary.model_name:
+                transcription_cache.put(
+                    audio_digest,
+                    model_router.primary.cache_variant,
+                    {"transcription": transcription, "model": model_tier, "vad": vad},
+                    cache_options,
+                )
+        decision = speech_gate.check_transcription(transcription)
+        if not decision.passed:
+            # Whisper heard no speech: do not spend an LLM call on an empty or hallucinated transcript
+            return rejected_response(decision, vad, model_tier, transcription)
+
+        user_text = transcription.text
+        async with session.chat_lock:
+            # Classified once the previous turns are recorded: concurrent uploads of the session
+            # would otherwise read the same turn order and language state and update it in any order
+            speaker = None
+            if session.speaker_routing:
+                speaker = session.classify_speaker(transcription)
+                metrics.increment(f"speaker.{speaker.side.lower()}")
+                metrics.increment(f"speaker.method.{speaker.method}")
+                metrics.observe("speaker.classify_seconds", speaker.seconds)
+            else:
+                session.record_language(transcription.language)
+
+            async with worker_pools.llm.slot():
+                assistant_response = await session.chat_model.send_message(
+                    user_text, speaker=speaker.side if speaker else None
+                )
+            session.add_interaction(user_text=user_text, assistant_response=assistant_response, model_tier=model_tier)
+            llm_usage = session.chat_model.last_call_stats
+            fulfilled = (
+                "fulfilled" in assistant_response.lower() or session.chat_model.history[-1]['type'] == 'SUMMARY'
+            )
 
         response = {
             "user_text": user_text,
-            "assistant_response": assistant_response
+            "assistant_response": assistant_response,
+            "model": model_tier,
+            "language": transcription.language,
+            "speaker": speaker.to_dict() if speaker else None,
+            "transcription": transcription.to_dict(),
+            "vad": vad,
+            "cached": cached is not None,
+            "llm_usage": llm_usage,
         }
 
-        if "fulfilled" in assistant_response.lower() or session.chat_model.history[-1]['type'] == 'SUMMARY':
+        if fulfilled:
             session.update_status('fulfilled')
             summary_generator = SummaryGenerator(llm=llm)
-            summary = summary_generator.generate_summary(session.history)
+            summary = await worker_pools.llm.run(summary_generator.generate_summary, session.history)
             response["summary"] = summary
 
         return response
 
+    except (HTTPException, OverloadedError):
+        raise
+    except (UploadTooLargeError, AudioTooLongError) as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing audio: {e}")
+    finally:
+        session.inflight_audio -= 1
+
+@app.websocket("/ws/transcribe/{session_id}")
+async def transcribe_stream(websocket: WebSocket, session_id: str):
+    """
+    Streaming transcription. The client sends binary audio chunks (16 kHz mono pcm_s16le by
+    default; a {"type": "config", "format": "pcm_f32le" | "opus"} text message switches the
+    format) and a {"type": "end"} message when done. The server emits JSON events:
+    "partial" and "final" transcript segments, then an "assistant" event for each finalized
+    utterance once LLMChat has replied.
+    """
+    await websocket.accept()
+    session = sessions.get(session_id)
+    if not session:
+        await websocket.send_json({"type": "error", "detail": "Invalid session ID."})
+        await websocket.close(code=1008)
+        return
+    if not session.chat_model:
+        session.initialize_chat()
+
+    send_lock = asyncio.Lock()
+
+    async def send_event(event):
+        async with send_lock:
+            await websocket.send_json(event)
+
+    async def reply(final_event, transcription, previous_reply):
+        # Replies are chained so the chat history sees utterances in the order they were spoken
+        if previous_reply is not None:
+            await previous_reply
+        try:
+            # Chaining orders this connection's utterances; the lock also excludes HTTP turns
+            async with session.chat_lock:
+                # Classified once the previous turns are recorded, so turn order is up to date
+                speaker = session.classify_speaker(transcription) if session.speaker_routing else None
+                async with worker_pools.llm.slot():
+                    assistant_response = await session.chat_model.send_message(
+                        final_event["text"], speaker=speaker.side if speaker else None
+                    )
+                session.add_interaction(user_text=final_event["text"], assistant_response=assistant_response)
+                if "fulfilled" in assistant_response.lower() or session.chat_model.history[-1]['type'] == 'SUMMARY':
+                    session.update_status('fulfilled')
+            event = {
+                "type": "assistant",
+                "utterance_id": final_event["utterance_id"],
+                "assistant_response": assistant_response,
+                "speaker": speaker.to_dict() if speaker else None,
+            }
+            await send_event(event)
+        except Exception as e:
+            await send_event({"type": "error", "detail": f"Error generating response: {e}"})
+
+    decoder = create_decoder("pcm_s16le")
+    streamer = StreamingTranscriber(
+        batch_transcriber,
+        window_seconds=config.STREAM_WINDOW_SECONDS,
+        step_seconds=config.STREAM_STEP_SECONDS,
+        overlap_seconds=config.STREAM_OVERLAP_SECONDS,
+        silence_ms=config.STREAM_SILENCE_MS,
+        speech_gate=speech_gate,
+        asr_stage=worker_pools.asr,
+    )
+    last_reply = None
+
+    async def handle_samples(samples, flush=False):
+        nonlocal last_reply
+        if streamer.feed(samples) or flush:
+            final_event = await streamer.finalize()
+            if final_event:
+                await send_event(final_event)
+                last_reply = asyncio.create_task(reply(final_event, streamer.last_transcription, last_reply))
+        elif streamer.partial_due():
+            streamer.start_partial(send_event)
+
+    metrics.increment("streaming.connections")
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                await handle_samples(await decoder.decode(message["bytes"]))
+                continue
+
+            control = json.loads(message.get("text") or "{}")
+            if control.get("type") == "config":
+                if control.get("sample_rate", 16000) != 16000:
+                    await send_event({"type": "error", "detail": "Only 16 kHz audio is supported."})
+                    continue
+                try:
+                    decoder = create_decoder(control.get("format", "pcm_s16le"))
+                except ValueError as e:
+                    await send_event({"type": "error", "detail": str(e)})
+            elif control.get("type") == "end":
+                await handle_samples(await decoder.close(), flush=True)
+                if last_reply is not None:
+                    await last_reply
+                await send_event({"type": "end"})
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        pass
+    except OverloadedError as e:
+        await send_event({"type": "error", "detail": str(e), "retry_after": e.retry_after})
+        await websocket.close(code=1013)
+    finally:
+        await streamer.cancel_partial()
+        await decoder.close()
+
+@app.get("/models")
+def get_models():
+    return dict(
+        model_registry.stats(), tiers=model_router.stats(), llm_client=llm_clients.stats(), prompts=prompt_registry.stats()
+    )
+
+@app.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
 
 @app.get("/summary/{session_id}")
 def get_summary(session_id: str):
@@ -0,0 +1,87 @@
+# app/metrics.py
+
+import threading
+import time
+from collections import deque
+
+
+class RollingSummary:
+    """
+    Keeps the most recent observations of a value and summarizes them on demand.
+    """
+
+    def __init__(self, window=1000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def summary(self):
+        if not self.samples:
+            return {"count": self.count}
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 6),
+            "p50": round(ordered[int(last * 0.50)], 6),
+            "p95": round(ordered[int(last * 0.95)], 6),
+            "max": round(ordered[-1], 6),
+        }
+
+
+class Metrics:
+    """
+    Thread-safe, in-process counters, gauges, rolling summaries and recent events, served as
+    JSON by the /metrics endpoint.
+    """
+
+    def __init__(self, window=1000, max_events=100):
+        self._lock = threading.Lock()
+        self._window = window
+        self._max_events = max_events
+        self._counters = {}
+        self._gauges = {}
+        self._summaries = {}
+        self._events = {}
+        self._started_at = time.time()
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name, value):
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                summary = self._summaries[name] = RollingSummary(self._window)
+            summary.observe(value)
+
+    def record_event(self, name, event):
+        with self._lock:
+            events = self._events.get(name)
+            if events is None:
+                events = self._events[name] = deque(maxlen=self._max_events)
+            events.append(dict(event, timestamp=round(time.time(), 3)))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "uptime_seconds": round(time.time() - self._started_at, 3),
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "summaries": {name: summary.summary() for name, summary in self._summaries.items()},
+                "events": {name: list(events) for name, events in self._events.items()},
+            }
+
+
+# Process-wide metrics registry
+metrics = Metrics()
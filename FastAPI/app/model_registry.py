@@ -0,0 +1,232 @@
+# app/model_registry.py
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import torch
+import whisper
+
+# float16: CUDA half precision. bfloat16: every forward pass (encoder, decoder, language ID, word
+# alignment) under bf16 autocast where the hardware supports it, with float32 weights. int8:
+# dynamic int8 quantization of the linear layers (CPU only).
+SUPPORTED_DTYPES = ("float32", "float16", "bfloat16", "int8")
+
+# What each dtype means for the weights and for the compute, as reported in stats
+PRECISION_MODES = {
+    "float32": "fp32 weights, fp32 compute",
+    "float16": "fp16 weights, fp16 compute",
+    "bfloat16": "fp32 weights, bf16 autocast compute",
+    "int8": "int8 linear weights (dynamic), fp32 activations",
+}
+
+
+def resolve_device(device=None):
+    return device if device else ("cuda" if torch.cuda.is_available() else "cpu")
+
+
+def resolve_dtype(device, dtype=None):
+    if dtype is None:
+        return "float16" if device.startswith("cuda") else "float32"
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported Whisper dtype '{dtype}', expected one of {SUPPORTED_DTYPES}.")
+    if dtype == "float16" and not device.startswith("cuda"):
+        raise ValueError("float16 Whisper inference requires a CUDA device.")
+    if dtype == "int8" and device != "cpu":
+        raise ValueError("int8 Whisper inference uses dynamic quantization, which runs on CPU only.")
+    if dtype == "bfloat16" and not bfloat16_supported(device):
+        print(f"bfloat16 is not accelerated on {device}, falling back to float32.")
+        return "float32"
+    return dtype
+
+
+def bfloat16_supported(device):
+    """
+    Whether bf16 matmuls are hardware-accelerated: on CUDA via the driver, on CPU via AVX512-BF16
+    or AMX (without them bf16 is emulated and slower than float32).
+    """
+    if device.startswith("cuda"):
+        return torch.cuda.is_bf16_supported()
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def quantize_int8(model):
+    """
+    Applies dynamic int8 quantization to the model's linear layers.
+
+    Whisper's Linear subclass (which only adds dtype casting) is swapped for a plain nn.Linear
+    first, since torch's quantization mappings match module types exactly.
+    """
+    for module in list(model.modules()):
+        for name, child in list(module.named_children()):
+            if isinstance(child, whisper.model.Linear):
+                plain = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+                plain.weight = child.weight
+                plain.bias = child.bias
+                setattr(module, name, plain)
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def current_rss_bytes():
+    """
+    Returns the resident set size of this process in bytes, or None when /proc is unavailable.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class LoadedModel:
+    """
+    A Whisper model loaded by the registry, together with its load/warm-up measurements.
+    """
+
+    def __init__(self, model, model_name, device, dtype, load_seconds, rss_delta_bytes):
+        self.model = model
+        self.model_name = model_name
+        self.device = device
+        self.dtype = dtype
+        self.load_seconds = load_seconds
+        self.rss_delta_bytes = rss_delta_bytes
+        self.param_bytes = sum(p.numel() * p.element_size() for p in model.parameters()) + sum(
+            b.numel() * b.element_size() for b in model.buffers()
+        )
+        self.warmup_seconds = None
+        self.lock = threading.Lock()  # Serializes warm-up against concurrent first use
+
+    @property
+    def fp16(self):
+        return self.dtype == "float16"
+
+    @property
+    def precision(self):
+        return PRECISION_MODES[self.dtype]
+
+    @contextmanager
+    def inference(self):
+        """
+        Context for running the model in its precision: no autograd, plus bf16 autocast for
+        bfloat16 models. Every decode, transcribe and alignment call goes through it, so the
+        reported dtype is the one the whole model ran in.
+        """
+        with torch.no_grad():
+            if self.dtype == "bfloat16":
+                with torch.autocast(device_type=self.device.split(":")[0], dtype=torch.bfloat16):
+                    yield
+            else:
+                yield
+
+    def encode(self, mel):
+        """
+        Runs the audio encoder in the model's precision. The returned features can be passed to
+        whisper.decode in place of the mel spectrogram, which then skips the encoder.
+        """
+        with self.inference():
+            return self.model.encoder(mel.half() if self.fp16 else mel)
+
+    def warm_up(self):
+        """
+        Runs a dummy decode over 30 seconds of silence so the first real request does not pay
+        for lazy kernel initialisation and memory allocation.
+        """
+        with self.lock:
+            if self.warmup_seconds is not None:
+                return self.warmup_seconds
+            start = time.perf_counter()
+            silence = np.zeros(whisper.audio.N_SAMPLES, dtype=np.float32)
+            mel = whisper.log_mel_spectrogram(silence, n_mels=self.model.dims.n_mels).to(self.device)
+            options = whisper.DecodingOptions(
+                language="en", without_timestamps=True, sample_len=4, fp16=self.fp16
+            )
+            with self.inference():
+                whisper.decode(self.model, self.encode(mel.unsqueeze(0)), options)
+            self.warmup_seconds = time.perf_counter() - start
+            print(f"Warmed up Whisper '{self.model_name}' in {self.warmup_seconds:.2f}s.")
+            return self.warmup_seconds
+
+    def stats(self):
+        return {
+            "model_name": self.model_name,
+            "device": self.device,
+            "dtype": self.dtype,
+            "precision": self.precision,
+            "load_seconds": round(self.load_seconds, 3),
+            "warmup_seconds": None if self.warmup_seconds is None else round(self.warmup_seconds, 3),
+            "param_bytes": self.param_bytes,
+            "rss_delta_bytes": self.rss_delta_bytes,
+        }
+
+
+class ModelRegistry:
+    """
+    Loads each (model_name, device, dtype) combination once per process and shares it across
+    requests.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def get(self, model_name="large", device=None, dtype=None, warm_up=False):
+        device = resolve_device(device)
+        dtype = resolve_dtype(device, dtype)
+        key = (model_name, device, dtype)
+
+        loaded = self._models.get(key)
+        if loaded is None:
+            with self._lock:
+                key_lock = self._key_locks.setdefault(key, threading.Lock())
+            # Per-key lock: concurrent callers wait for a single load instead of loading twice,
+            # while loads of different models can proceed in parallel.
+            with key_lock:
+                loaded = self._models.get(key)
+                if loaded is None:
+                    loaded = self._load(model_name, device, dtype)
+                    self._models[key] = loaded
+
+        if warm_up:
+            loaded.warm_up()
+        return loaded
+
+    def _load(self, model_name, device, dtype):
+        print(f"Loading Whisper model '{model_name}' on {device} ({dtype})...")
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        model = whisper.load_model(model_name, device=device)
+        if dtype == "float16":
+            model = model.half()
+        elif dtype == "bfloat16":
+            # whisper.decode/transcribe reject anything but float32 features when fp16 is off
+            model.encoder.register_forward_hook(lambda module, inputs, output: output.float())
+        elif dtype == "int8":
+            model = quantize_int8(model)
+        model.eval()
+        load_seconds = time.perf_counter() - start
+        rss_after = current_rss_bytes()
+        rss_delta = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        print(f"Whisper model '{model_name}' loaded in {load_seconds:.2f}s.")
+        return LoadedModel(model, model_name, device, dtype, load_seconds, rss_delta)
+
+    def loaded_models(self):
+        return list(self._models.values())
+
+    def stats(self):
+        return {
+            "models": [loaded.stats() for loaded in self.loaded_models()],
+            "process_rss_bytes": current_rss_bytes(),
+        }
+
+
+# Process-wide registry shared by every TranscriptionHandler
+model_registry = ModelRegistry()
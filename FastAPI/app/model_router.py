@@ -0,0 +1,193 @@
+# app/model_router.py
+
+import asyncio
+import math
+import time
+
+import whisper
+
+from .batch_transcriber import BatchTranscriber
+from .metrics import metrics
+from .transcription_handler import TranscriptionHandler
+
+# Rough CPU seconds per 30-second window, used until a tier has served real requests
+DEFAULT_WINDOW_SECONDS = {"tiny": 0.5, "base": 1.0, "small": 3.0, "medium": 8.0, "large": 20.0, "turbo": 6.0}
+# Rough load + warm-up time, charged to tiers that are not resident yet
+DEFAULT_LOAD_SECONDS = {"tiny": 1.0, "base": 2.0, "small": 5.0, "medium": 15.0, "large": 40.0, "turbo": 15.0}
+
+
+class ModelTier:
+    """
+    One Whisper size with its own BatchTranscriber and a running estimate of its cost.
+    """
+
+    def __init__(self, model_name, device=None, dtype=None, batch_size=8, batch_wait_ms=20, executor=None,
+                 long_form="parallel", max_queue_depth=16, smoothing=0.2, warm_up=True, min_hint_logprob=-1.0,
+                 language_probs=False, word_timestamps=False):
+        self.model_name = model_name
+        self.device = device
+        self.dtype = dtype
+        self.batch_size = batch_size
+        self.batch_wait_ms = batch_wait_ms
+        self.executor = executor
+        self.long_form = long_form
+        self.max_queue_depth = max_queue_depth
+        self.smoothing = smoothing
+        self.warm_up = warm_up
+        self.min_hint_logprob = min_hint_logprob
+        self.language_probs = language_probs
+        self.word_timestamps = word_timestamps
+        self.window_seconds = DEFAULT_WINDOW_SECONDS.get(model_name.split(".")[0].split("-")[0], 10.0)
+        self.batcher = None
+        self.inflight = 0
+        self._load_lock = asyncio.Lock()
+
+    @property
+    def loaded(self):
+        return self.batcher is not None
+
+    @property
+    def queue_depth(self):
+        return self.inflight
+
+    @property
+    def cache_variant(self):
+        # Transcripts are only reused for the same model size, precision and decoding options
+        return (
+            f"{self.model_name}/{self.dtype or 'auto'}/{self.long_form}/hint>={self.min_hint_logprob}"
+            f"/probs={self.language_probs}/words={self.word_timestamps}"
+        )
+
+    async def ensure_loaded(self):
+        if self.batcher is not None:
+            return self.batcher
+        async with self._load_lock:
+            if self.batcher is None:
+                loop = asyncio.get_running_loop()
+
+                def load():
+                    handler = TranscriptionHandler(self.model_name, device=self.device, dtype=self.dtype)
+                    if self.warm_up:
+                        handler.warm_up()
+                    return handler
+
+                handler = await loop.run_in_executor(self.executor, load)
+                batcher = BatchTranscriber(
+                    handler,
+                    max_batch_size=self.batch_size,
+                    max_wait_ms=self.batch_wait_ms,
+                    executor=self.executor,
+                    long_form=self.long_form,
+                    min_hint_logprob=self.min_hint_logprob,
+                    language_probs=self.language_probs,
+                    word_timestamps=self.word_timestamps,
+                )
+                await batcher.start()
+                self.batcher = batcher
+        return self.batcher
+
+    def estimate_seconds(self, audio_seconds):
+        """
+        Expected latency: the request's own windows plus the work queued ahead of it (which is
+        shared across batches), plus the load time if the model is not resident.
+        """
+        windows = max(1, math.ceil(audio_seconds / 30.0))
+        queued_batches = self.queue_depth / self.batch_size
+        estimate = self.window_seconds * (windows + queued_batches)
+        if not self.loaded:
+            estimate += DEFAULT_LOAD_SECONDS.get(self.model_name.split(".")[0].split("-")[0], 30.0)
+        return estimate
+
+    def observe(self, audio_seconds, seconds):
+        windows = max(1, math.ceil(audio_seconds / 30.0))
+        self.window_seconds += self.smoothing * (seconds / windows - self.window_seconds)
+
+    def stats(self):
+        return {
+            "model_name": self.model_name,
+            "loaded": self.loaded,
+            "inflight": self.inflight,
+            "window_seconds_estimate": round(self.window_seconds, 3),
+        }
+
+
+class ModelTierRouter:
+    """
+    Chooses a Whisper size per request.
+
+    Tiers are ordered from highest to lowest quality. A request goes to the best tier whose
+    estimated latency fits the client's latency budget (if one was given) and whose queue is not
+    saturated; when none qualifies, the fastest tier serves it. Tiers can be kept resident from
+    startup or loaded lazily the first time they are chosen. Every routing decision is recorded
+    in metrics so the quality impact of degraded requests can be audited.
+    """
+
+    def __init__(self, tiers, preload=None):
+        self.tiers = list(tiers)
+        self.preload = set(preload) if preload is not None else {self.tiers[0].model_name}
+
+    @property
+    def primary(self):
+        return self.tiers[0]
+
+    async def start(self):
+        for tier in self.tiers:
+            if tier.model_name in self.preload:
+                await tier.ensure_loaded()
+
+    async def stop(self):
+        for tier in self.tiers:
+            if tier.batcher is not None:
+                await tier.batcher.stop()
+
+    def choose(self, audio_seconds, latency_budget_ms=None):
+        for tier in self.tiers:
+            if tier.queue_depth >= tier.max_queue_depth:
+                continue
+            if latency_budget_ms is not None and tier.estimate_seconds(audio_seconds) * 1000 > latency_budget_ms:
+                continue
+            if latency_budget_ms is None and not tier.loaded and tier is not self.tiers[-1]:
+                # Without a budget, only pay a model load when degrading is the last resort
+                continue
+            return tier
+        return min(self.tiers, key=lambda t: t.estimate_seconds(audio_seconds))
+
+    async def transcribe(self, audio, latency_budget_ms=None, options=None, language_hint=None):
+        """
+        Transcribes audio on the chosen tier.
+
+        :return: Tuple of (TranscriptionResult, name of the model that served the request).
+        """
+        audio_seconds = len(audio) / whisper.audio.SAMPLE_RATE
+        tier = self.choose(audio_seconds, latency_budget_ms)
+        estimate = tier.estimate_seconds(audio_seconds)
+        queue_depth = tier.queue_depth
+
+        tier.inflight += 1
+        started_at = time.perf_counter()
+        try:
+            batcher = await tier.ensure_loaded()
+            result = await batcher.transcribe(audio, options, language_hint)
+        finally:
+            tier.inflight -= 1
+        seconds = time.perf_counter() - started_at
+        tier.observe(audio_seconds, seconds)
+
+        metrics.increment(f"transcription.tier.{tier.model_name}")
+        if tier is not self.primary:
+            metrics.increment("transcription.tier_degraded")
+        metrics.record_event("transcription.routing", {
+            "model": tier.model_name,
+            "audio_seconds": round(audio_seconds, 3),
+            "queue_depth": queue_depth,
+            "latency_budget_ms": latency_budget_ms,
+            "estimated_seconds": round(estimate, 3),
+            "seconds": round(seconds, 3),
+        })
+        return result, tier.model_name
+
+    def tier(self, model_name):
+        return next(tier for tier in self.tiers if tier.model_name == model_name)
+
+    def stats(self):
+        return [tier.stats() for tier in self.tiers]
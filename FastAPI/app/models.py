@@ -1,26 +1,135 @@
 # app/models.py
+import asyncio
 from .chat_model import LLMChat  # Import the LLMChat class
+from . import config
+from .language_hints import whisper_language_code
+from .speaker_side import TARGET, USER, SpeakerSideClassifier
+from .noise_profile_cache import noise_profile_cache
+from .response_cache import response_cache
 
 class SessionState:
-    def __init__(self, objective, target_language):
+    def __init__(self, objective, target_language, session_id=None, user_language='English', country=None,
+                 speaker_routing=False, bypass_response_cache=False):
+        self.session_id = session_id
         self.objective = objective
         self.target_language = target_language
+        self.user_language = user_language
+        self.country = country
+        self.detected_languages = {}  # 'user' / 'target' -> Whisper language code last heard from that side
+        # Tag transcribed turns with the side that spoke them (see classify_speaker)
+        self.speaker_routing = speaker_routing
+        self.bypass_response_cache = bypass_response_cache
+        self.speaker_classifier = SpeakerSideClassifier(
+            self.configured_language('user'), self.configured_language('target')
+        )
         self.history = []  # List of dictionaries: {'user': ..., 'assistant': ...}
         self.current_status = 'ongoing'  # Can be 'ongoing', 'fulfilled', 'failed'
         self.chat_model = None  # Instance of LLMChat
+        # Held from appending a user turn to LLMChat until its reply is recorded, so concurrent
+        # requests for the session cannot interleave turns (or fold the context window) mid-turn
+        self.chat_lock = asyncio.Lock()
+        self.inflight_audio = 0  # Audio requests currently being processed for this session
 
     def initialize_chat(self):
         """
         Initializes the LLMChat instance with the session's objective and target language.
         """
+        options = {"country": self.country} if self.country else {}
         self.chat_model = LLMChat(
-            user_language='English',  # You can modify this based on user settings
+            user_language=self.user_language,
             target_language=self.target_language,
-            initial_message=self.objective
+            initial_message=self.objective,
+            speaker_tags=self.speaker_routing,
+            base_url=config.LLM_BASE_URL,
+            model_name=config.LLM_MODEL,
+            max_context_tokens=config.LLM_CONTEXT_MAX_TOKENS or None,
+            keep_turns=config.LLM_CONTEXT_KEEP_TURNS,
+            response_cache=None if self.bypass_response_cache or not response_cache.enabled else response_cache,
+            **options
         )
 
-    def add_interaction(self, user_text, assistant_response):
-        self.history.append({"user": user_text, "assistant": assistant_response})
+    def expected_speaker(self):
+        """
+        Who is expected to speak next: 'target' after a message addressed to the target, 'user'
+        after one addressed to the user, None before the first reply.
+        """
+        if not self.chat_model:
+            return None
+        for message in reversed(self.chat_model.history):
+            if message['type'].lower() in ['assistant', 'summary', 'caution']:
+                return 'target' if message['recipient'].lower() == 'target' else 'user'
+        return None
+
+    def configured_language(self, side):
+        return whisper_language_code(self.target_language if side == 'target' else self.user_language)
+
+    def language_hint(self):
+        """
+        Whisper language code to decode the next turn in, or None to let Whisper detect it.
+        """
+        side = self.expected_speaker()
+        if side is None:
+            return None
+        return self.detected_languages.get(side) or self.configured_language(side)
+
+    def record_language(self, language, side=None):
+        """
+        Remembers the language a turn was transcribed in, for the side that spoke it (or, when
+        unknown, the side that most likely did).
+        """
+        side = side if side else self.expected_speaker()
+        if not language or side is None:
+            return
+        other = 'user' if side == 'target' else 'target'
+        if language in (self.detected_languages.get(other), self.configured_language(other)):
+            side = other  # The other party spoke out of turn
+        self.detected_languages[side] = language
+
+    def message_speaker(self, speaker=None):
+        """
+        Speaker tag for a typed turn when speaker routing is on, so that it is tagged like
+        transcribed turns: the side the client named, else the side expected from turn order.
+
+        :param speaker: 'USER' or 'TARGET' from the request, or None.
+        :return: 'USER', 'TARGET', or None when turns are not tagged.
+        """
+        if not self.speaker_routing:
+            return None
+        if speaker:
+            return speaker
+        return TARGET if self.expected_speaker() == 'target' else USER
+
+    def classify_speaker(self, transcription):
+        """
+        Tags a transcribed turn as USER or TARGET side and remembers its language for that side.
+
+        :param transcription: TranscriptionResult of the turn.
+        :return: SpeakerSide.
+        """
+        speaker = self.speaker_classifier.classify(transcription, self.expected_speaker())
+        self.record_language(transcription.language, speaker.side.lower())
+        return speaker
+
+    @property
+    def noise_profile(self):
+        """
+        The session's learned noise profile (from the shared, TTL/LRU-bounded cache), or None.
+        """
+        return noise_profile_cache.get(self.session_id) if self.session_id else None
+
+    @property
+    def learning_noise_profile(self):
+        return bool(self.session_id) and noise_profile_cache.is_learning(self.session_id)
+
+    def update_noise_profile(self, profile):
+        if self.session_id:
+            noise_profile_cache.update(self.session_id, profile)
+
+    def add_interaction(self, user_text, assistant_response, model_tier=None):
+        interaction = {"user": user_text, "assistant": assistant_response}
+        if model_tier:
+            interaction["model_tier"] = model_tier  # Whisper size that transcribed the turn, for quality audits
+        self.history.append(interaction)
 
     def update_status(self, status):
         self.current_status = status
@@ -0,0 +1,99 @@
+# app/noise_profile_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+
+from .metrics import metrics
+
+
+class _CacheEntry:
+    __slots__ = ("profile", "utterances", "last_used")
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.utterances = 1
+        self.last_used = time.monotonic()
+
+
+class NoiseProfileCache:
+    """
+    Noise profiles keyed by session_id.
+
+    A session's profile is learned from the non-speech frames of its first `learn_utterances`
+    utterances (merged frame-weighted) and then reused as-is for stationary gating of later
+    ones. Entries idle for longer than `ttl_seconds` expire, and at most `max_sessions` are kept,
+    evicting the least recently used first.
+    """
+
+    def __init__(self, max_sessions=1000, ttl_seconds=1800, learn_utterances=3):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.learn_utterances = learn_utterances
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _live_entry(self, session_id):
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.last_used > self.ttl_seconds:
+            del self._entries[session_id]
+            metrics.increment("noise_profile.expired")
+            return None
+        return entry
+
+    def get(self, session_id):
+        """
+        Returns the session's profile, or None if it has none (or it expired).
+        """
+        with self._lock:
+            entry = self._live_entry(session_id)
+            if entry is None:
+                metrics.increment("noise_profile.misses")
+                return None
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(session_id)
+            metrics.increment("noise_profile.hits")
+            return entry.profile
+
+    def is_learning(self, session_id):
+        """
+        Whether the session's profile should still be refined from new utterances.
+        """
+        with self._lock:
+            entry = self._live_entry(session_id)
+            return entry is None or entry.utterances < self.learn_utterances
+
+    def update(self, session_id, profile):
+        """
+        Merges a profile learned from one utterance into the session's entry.
+        """
+        if profile is None:
+            return
+        with self._lock:
+            entry = self._live_entry(session_id)
+            if entry is None:
+                self._entries[session_id] = _CacheEntry(profile)
+            else:
+                entry.profile = entry.profile.merge(profile)
+                entry.utterances += 1
+                entry.last_used = time.monotonic()
+                self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+                metrics.increment("noise_profile.evicted")
+            self._update_gauges()
+
+    def discard(self, session_id):
+        with self._lock:
+            self._entries.pop(session_id, None)
+            self._update_gauges()
+
+    def _update_gauges(self):
+        metrics.set_gauge("noise_profile.sessions", len(self._entries))
+        metrics.set_gauge("noise_profile.bytes", sum(e.profile.nbytes for e in self._entries.values()))
+
+
+# Process-wide cache; session state is looked up through SessionState.noise_profile
+noise_profile_cache = NoiseProfileCache()
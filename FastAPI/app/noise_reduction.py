@@ -0,0 +1,188 @@
+# app/noise_reduction.py
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.signal import fftconvolve
+
+NOISE_STRATEGIES = ("stationary", "nonstationary", "bypass")
+
+
+def stft(audio, n_fft, hop_length):
+    """
+    Hann-windowed STFT of a float32 signal, returned as a (frames, bins) complex64 array.
+    """
+    window = np.hanning(n_fft + 1)[:-1].astype(np.float32)
+    padded = np.pad(audio, (n_fft // 2, n_fft // 2 + n_fft), mode="reflect" if len(audio) > n_fft else "constant")
+    n_frames = 1 + (len(padded) - n_fft) // hop_length
+    frames = np.lib.stride_tricks.as_strided(
+        padded, shape=(n_frames, n_fft), strides=(padded.strides[0] * hop_length, padded.strides[0])
+    )
+    return np.fft.rfft(frames * window, axis=1).astype(np.complex64)
+
+
+def istft(spectrum, n_fft, hop_length, length):
+    """
+    Inverse of `stft` by windowed overlap-add, trimmed to `length` samples.
+    """
+    window = np.hanning(n_fft + 1)[:-1].astype(np.float32)
+    frames = np.fft.irfft(spectrum, n=n_fft, axis=1).astype(np.float32) * window
+    total = n_fft + hop_length * (len(frames) - 1)
+    if n_fft % hop_length == 0:
+        # Frames split into hop-sized blocks land on whole output blocks: one strided add per
+        # block offset (n_fft / hop_length of them) instead of one per frame
+        ratio = n_fft // hop_length
+        blocks = frames.reshape(len(frames), ratio, hop_length)
+        output = np.zeros((len(frames) + ratio - 1, hop_length), dtype=np.float32)
+        norm = np.zeros_like(output)
+        squared = (window ** 2).reshape(ratio, hop_length)
+        for k in range(ratio):
+            output[k:k + len(frames)] += blocks[:, k]
+            norm[k:k + len(frames)] += squared[k]
+        output, norm = output.ravel(), norm.ravel()
+    else:
+        # Scatter-add every frame sample onto its output index
+        indices = (np.arange(len(frames))[:, None] * hop_length + np.arange(n_fft)).ravel()
+        output = np.bincount(indices, weights=frames.ravel(), minlength=total).astype(np.float32)
+        norm = np.bincount(indices, weights=np.tile(window ** 2, len(frames)), minlength=total).astype(np.float32)
+    output /= np.maximum(norm, 1e-8)
+    return output[n_fft // 2:n_fft // 2 + length]
+
+
+class NoiseProfile:
+    """
+    Per-frequency noise statistics (mean and standard deviation of the STFT magnitude in dB).
+    """
+
+    def __init__(self, mean_db, std_db, n_frames):
+        self.mean_db = mean_db
+        self.std_db = std_db
+        self.n_frames = n_frames
+
+    @property
+    def nbytes(self):
+        return self.mean_db.nbytes + self.std_db.nbytes
+
+    def merge(self, other):
+        """
+        Combines two profiles, weighting each by the number of frames it was estimated from.
+        """
+        total = self.n_frames + other.n_frames
+        w_self, w_other = self.n_frames / total, other.n_frames / total
+        mean = w_self * self.mean_db + w_other * other.mean_db
+        # Pooled variance including the spread between the two means
+        var = (
+            w_self * (self.std_db ** 2 + (self.mean_db - mean) ** 2)
+            + w_other * (other.std_db ** 2 + (other.mean_db - mean) ** 2)
+        )
+        return NoiseProfile(mean.astype(np.float32), np.sqrt(var).astype(np.float32), total)
+
+    def shifted(self, gain_db):
+        """
+        The same profile for audio scaled by `gain_db` (a gain shifts every magnitude by the same dB).
+        """
+        return NoiseProfile((self.mean_db + gain_db).astype(np.float32), self.std_db, self.n_frames)
+
+
+class NoiseReducer:
+    """
+    Selectable noise-reduction strategies, float32 throughout:
+
+    - stationary: spectral gating against a noise profile, either supplied (e.g. cached for the
+      session) or estimated from the clip's quietest frames. Long inputs are processed in
+      chunks of `chunk_seconds`, optionally in parallel across `n_jobs` threads (NumPy FFTs
+      release the GIL).
+    - nonstationary: noisereduce's time-varying gating, the previous default.
+    - bypass: returns the input unchanged.
+    """
+
+    def __init__(self, strategy="stationary", sample_rate=16000, n_fft=512, hop_length=128,
+                 n_std_thresh=1.5, prop_decrease=1.0, freq_smooth_hz=500, time_smooth_ms=50,
+                 noise_percentile=20, chunk_seconds=10.0, n_jobs=1):
+        if strategy not in NOISE_STRATEGIES:
+            raise ValueError(f"Unsupported noise reduction strategy '{strategy}', expected one of {NOISE_STRATEGIES}.")
+        self.strategy = strategy
+        self.sample_rate = sample_rate
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_std_thresh = n_std_thresh
+        self.prop_decrease = prop_decrease
+        self.noise_percentile = noise_percentile
+        self.chunk_samples = int(chunk_seconds * sample_rate)
+        self.n_jobs = n_jobs
+        self._smoothing_kernel = self._build_smoothing_kernel(freq_smooth_hz, time_smooth_ms)
+
+    def _build_smoothing_kernel(self, freq_smooth_hz, time_smooth_ms):
+        # Triangular kernel over (time, frequency) to avoid musical-noise artifacts in the mask
+        n_freq = max(1, int(freq_smooth_hz / (self.sample_rate / self.n_fft)))
+        n_time = max(1, int(time_smooth_ms / 1000 * self.sample_rate / self.hop_length))
+        freq = np.concatenate([np.linspace(0, 1, n_freq + 1, endpoint=False), np.linspace(1, 0, n_freq + 2)])[1:-1]
+        time = np.concatenate([np.linspace(0, 1, n_time + 1, endpoint=False), np.linspace(1, 0, n_time + 2)])[1:-1]
+        kernel = np.outer(time, freq).astype(np.float32)
+        return kernel / kernel.sum()
+
+    def _magnitude_db(self, spectrum):
+        return 20.0 * np.log10(np.maximum(np.abs(spectrum), 1e-10))
+
+    def estimate_profile(self, noise_audio, quietest_only=True):
+        """
+        Estimates a NoiseProfile from audio.
+
+        :param noise_audio: Float32 audio containing (mostly) noise.
+        :param quietest_only: Use only the lowest-energy frames, for input that also contains speech.
+        :return: NoiseProfile, or None when the input is too short.
+        """
+        if len(noise_audio) < self.n_fft:
+            return None
+        mag_db = self._magnitude_db(stft(noise_audio.astype(np.float32, copy=False), self.n_fft, self.hop_length))
+        if quietest_only:
+            frame_energy = mag_db.mean(axis=1)
+            mag_db = mag_db[frame_energy <= np.percentile(frame_energy, self.noise_percentile)]
+        return NoiseProfile(mag_db.mean(axis=0), mag_db.std(axis=0), len(mag_db))
+
+    def reduce(self, audio, noise_profile=None):
+        """
+        Applies the configured strategy and returns float32 audio of the same length.
+        """
+        audio = audio.astype(np.float32, copy=False)
+        if self.strategy == "bypass" or not len(audio):
+            return audio
+        if self.strategy == "nonstationary":
+            import noisereduce as nr
+
+            return nr.reduce_noise(
+                y=audio, sr=self.sample_rate, stationary=False, chunk_size=self.chunk_samples, n_jobs=self.n_jobs
+            ).astype(np.float32, copy=False)
+
+        if noise_profile is None:
+            noise_profile = self.estimate_profile(audio)
+            if noise_profile is None:
+                return audio
+
+        if len(audio) <= self.chunk_samples:
+            return self._gate(audio, noise_profile)
+
+        # Chunks overlap by n_fft samples of context on each side so that no seam is audible
+        context = self.n_fft
+        bounds = [(start, min(start + self.chunk_samples, len(audio))) for start in range(0, len(audio), self.chunk_samples)]
+
+        def process(bound):
+            start, end = bound
+            lo, hi = max(0, start - context), min(len(audio), end + context)
+            gated = self._gate(audio[lo:hi], noise_profile)
+            return gated[start - lo:start - lo + (end - start)]
+
+        if self.n_jobs > 1:
+            with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
+                chunks = list(executor.map(process, bounds))
+        else:
+            chunks = [process(bound) for bound in bounds]
+        return np.concatenate(chunks)
+
+    def _gate(self, audio, noise_profile):
+        spectrum = stft(audio, self.n_fft, self.hop_length)
+        threshold = noise_profile.mean_db + self.n_std_thresh * noise_profile.std_db
+        mask = (self._magnitude_db(spectrum) > threshold[np.newaxis, :]).astype(np.float32)
+        mask = np.clip(fftconvolve(mask, self._smoothing_kernel, mode="same"), 0.0, 1.0)
+        gain = mask + (1.0 - mask) * (1.0 - self.prop_decrease)
+        return istft(spectrum * gain, self.n_fft, self.hop_length, len(audio))
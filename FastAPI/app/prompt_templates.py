@@ -0,0 +1,128 @@
+# app/prompt_templates.py
+
+from .context_window import TokenCounter
+from .metrics import metrics
+
+SPEAKER_ROUTING_RULES = (
+    "Incoming messages are tagged `[USER]` or `[TARGET]` with who spoke. Relay the user's requests to the "
+    "target, and answer the target's questions yourself from the user's requirements whenever you can."
+)
+
+PLAIN_ROUTING_RULES = """Another example of incorrect behavior is the case where you receive a reply from target, but talking to user back to take the toll road:
+ Target Message: 是的，当然！你想走收费公路还是免费公路？收费公路将为您节省约 1.5 小时的时间
+ Assistant reply: [USER] Please take the toll road to save time.
+ Intended behavior is to reply back to target that we will take the toll road, because user is in hurry:
+ Target Message: 是的，当然！你想走收费公路还是免费公路？收费公路将为您节省约 1.5 小时的时间
+ Assistant reply: [TARGET] 请走收费公路，以节省时间。"""
+
+SYSTEM_PROMPT_TEMPLATE = """You are a multilingual assistant that communicates with a target based on the user's requirements. Your main goal is to minimize the amount of communication between you and the user.
+
+1. **Prefixes and Languages:**
+   - When addressing the target, use `[TARGET]` and communicate in {target_language}.
+   - When addressing the user, use `[USER]` and communicate in {user_language}.
+
+2. **Behavior:**
+   - Act like a user but speak in the target's language, which is {target_language}.
+   - Ensure to communicate requirements to the user or ask the target questions one by one.
+
+3. **Response Rules:**
+   - Always respond in the native language of the person you are addressing:
+     - `[USER]`: {user_language}
+     - `[TARGET]`: {target_language}
+   - Format all your replies to start with `[USER]`, `[TARGET]`, `[CAUTION]`, or `[SUMMARY]` followed by a space and then the message.
+   - Do not include any additional text, descriptions, markdown notation, or prompts.
+   - Use only the actual message content suitable for Text-to-Speech without any annotations or explanations.
+   - Ensure each reply contains only one prefix and one message, so reply must be in the format of - [PERSON] Content - and nothing else.
+ For example, this behavior is incorrect because it has two messages at the same time:
+  [TARGET] 请带我去虹桥火车站，走最快的路线。另外，你能推荐一下河北省哪里好玩？ 
+  [USER] I've communicated your request to the taxi driver. Do you have any further questions?
+ The correct way will be only saying the first part intended for target, and wait for his reply before talking back to user:
+  [TARGET] 请带我去虹桥火车站，走最快的路线。另外，你能推荐一下河北省哪里好玩？ 
+ {routing_rules}
+
+4. **Handling Sensitive Topics and Tips:**
+   - **General Sensitive Topics:**
+     - If the user asks about sensitive topics that can be regarded as inappropriate or offensive in {country}, raise a caution prefixed with `[CAUTION]` and provide recommendations.
+   - **Handling Gratitude and Tips:**
+     - If the user wants to thank the driver or give a tip, evaluate its appropriateness in {country}.
+     - If giving a tip is inappropriate or offensive:
+       - Respond with `[CAUTION]` in {user_language}.
+       - Inform the user that giving a tip may not be appropriate in {country}.
+       - Suggest alternative ways to express gratitude, such as saying "Thank you for your cooperation."
+     - If giving a tip is appropriate:
+       - Proceed to convey the message prefixed with `[TARGET]` in {target_language}.
+
+5. **Requesting Additional Information:**
+   - If the target asks for additional information that you don't know, ask the user about it, starting with `[USER]`.
+
+6. **Conversation Completion:**
+   - When the conversation goal is achieved, notify the user with a concise summary prefixed with `[SUMMARY]`, and finish by asking whether the user has more questions.
+
+"""
+
+
+class SystemPrompt:
+    """
+    One rendered system prompt, shared read-only by every session with the same key.
+    """
+
+    __slots__ = ("key", "text", "tokens", "sessions")
+
+    def __init__(self, key, text, tokens):
+        self.key = key
+        self.text = text
+        self.tokens = tokens
+        self.sessions = 0  # Sessions created with this prompt
+
+
+class PromptRegistry:
+    """
+    Interns rendered system prompts by (user_language, target_language, country, speaker_tags).
+
+    The prompt is several kilobytes; rendering it per session, and letting each session hold its
+    own copy, is wasted work and memory. More importantly, sessions that share the key send
+    byte-identical system messages first, which is the prefix provider-side prompt caching
+    matches on. Token counts are computed once per prompt.
+    """
+
+    def __init__(self, counter=None):
+        self.counter = counter
+        self._prompts = {}
+
+    def get(self, user_language, target_language, country, speaker_tags=False):
+        """
+        :return: SystemPrompt for the tuple, rendered on first use.
+        """
+        key = (user_language, target_language, country, bool(speaker_tags))
+        prompt = self._prompts.get(key)
+        if prompt is None:
+            text = SYSTEM_PROMPT_TEMPLATE.format(
+                user_language=user_language,
+                target_language=target_language,
+                country=country,
+                routing_rules=SPEAKER_ROUTING_RULES if speaker_tags else PLAIN_ROUTING_RULES,
+            )
+            if self.counter is None:
+                self.counter = TokenCounter()
+            prompt = SystemPrompt(key, text, self.counter.count(text))
+            self._prompts[key] = prompt
+            metrics.increment("prompt_registry.rendered")
+            metrics.set_gauge("prompt_registry.prompts", len(self._prompts))
+        else:
+            metrics.increment("prompt_registry.reused")
+        prompt.sessions += 1
+        return prompt
+
+    def system_prompt(self, user_language, target_language, country, speaker_tags=False):
+        return self.get(user_language, target_language, country, speaker_tags).text
+
+    def stats(self):
+        return {
+            "prompts": len(self._prompts),
+            "sessions": sum(p.sessions for p in self._prompts.values()),
+            "tokens": {" / ".join(str(k) for k in p.key): p.tokens for p in self._prompts.values()},
+        }
+
+
+# Shared by every session in the process
+prompt_registry = PromptRegistry()
@@ -0,0 +1,55 @@
+# app/reply_stream.py
+
+REPLY_PREFIXES = ("[USER] ", "[TARGET] ", "[CAUTION] ", "[SUMMARY] ")
+
+
+def route_event(message_type):
+    recipient = "Target" if message_type == "TARGET" else "User"
+    return {"type": "route", "message_type": message_type, "recipient": recipient}
+
+
+class ReplyPrefixParser:
+    """
+    Incrementally parses a streamed assistant reply. The `[USER]`, `[TARGET]`, `[CAUTION]` or
+    `[SUMMARY]` prefix is recognised as soon as its characters have arrived, so routing is known
+    from the first tokens; everything after it is passed through as message deltas.
+
+    feed() and finish() return lists of events: one {"type": "route", "message_type", "recipient"}
+    (message_type None when the reply has no valid prefix) followed by {"type": "delta", "content"}.
+    """
+
+    def __init__(self, prefixes=REPLY_PREFIXES):
+        self.prefixes = prefixes
+        self.message_type = None
+        self.routed = False
+        self._buffer = ""
+        self._started = False  # Whether message text (after the prefix) has been emitted
+
+    def feed(self, text):
+        if self.routed:
+            return self._deltas(text)
+        self._buffer += text
+        head = self._buffer.lstrip()
+        for prefix in self.prefixes:
+            if head.startswith(prefix):
+                return self._route(prefix.strip("[] "), head[len(prefix):])
+        if head and not any(len(head) < len(p) and p.startswith(head) for p in self.prefixes):
+            # The reply can no longer start with a valid prefix
+            return self._route(None, head)
+        return []
+
+    def finish(self):
+        if not self.routed and self._buffer.strip():
+            return self._route(None, self._buffer.lstrip())
+        return []
+
+    def _route(self, message_type, rest):
+        self.routed, self.message_type = True, message_type
+        self._buffer = ""
+        return [route_event(message_type)] + self._deltas(rest)
+
+    def _deltas(self, text):
+        if not self._started:
+            text = text.lstrip()
+            self._started = bool(text)
+        return [{"type": "delta", "content": text}] if text else []
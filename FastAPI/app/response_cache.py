@@ -0,0 +1,198 @@
+# app/response_cache.py
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from .metrics import metrics
+
+
+def normalize_content(text):
+    """
+    Normalizes message text for cache keys: Unicode NFC and collapsed whitespace. Nothing that
+    changes meaning (case, punctuation) is touched.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class ResponseCache:
+    """
+    Replies of deterministic (temperature 0) chat completions, keyed by a hash of the model,
+    temperature, request options and normalized message list. Only an exactly matching request
+    is served, so a hit returns what the model would have answered anyway, without the network
+    round trip.
+
+    Entries live in a thread-safe in-memory LRU of at most `max_entries`, and optionally in a
+    SQLite table that survives restarts and is shared by workers on the same host; both expire
+    after `ttl_seconds`. Async callers use aget/aput, which run the SQLite work in a thread so
+    that disk I/O never blocks the event loop.
+
+    :param max_entries: Memory tier size; 0 disables the cache.
+    :param ttl_seconds: Lifetime of an entry.
+    :param sqlite_path: Database file for the persistent tier, or None.
+    """
+
+    def __init__(self, max_entries=0, ttl_seconds=3600, sqlite_path=None):
+        self.configure(max_entries, ttl_seconds, sqlite_path)
+
+    def configure(self, max_entries, ttl_seconds=3600, sqlite_path=None):
+        if getattr(self, "_db", None) is not None:
+            self._db.close()
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path
+        self._entries = OrderedDict()  # key -> (reply, created_at)
+        self._lock = threading.Lock()  # Guards the in-memory entries only; taken on the event loop
+        self._db_lock = threading.Lock()  # Serializes SQLite use, which may wait on disk I/O
+        self._db = None
+        self._writes = 0
+        if sqlite_path and max_entries > 0:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, reply TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+            self._prune_db()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(model, temperature, messages, **options):
+        """
+        :param messages: Chat-completion messages (dicts with 'role' and 'content').
+        :param options: Other request parameters that affect the reply (e.g. max_tokens).
+        """
+        request = {
+            "model": model,
+            "temperature": temperature,
+            "options": options,
+            "messages": [[m["role"], normalize_content(m["content"])] for m in messages],
+        }
+        encoded = json.dumps(request, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.blake2b(encoded.encode(), digest_size=20).hexdigest()
+
+    @staticmethod
+    def cacheable(temperature):
+        return temperature == 0
+
+    def get(self, key):
+        """
+        :return: The cached reply, or None.
+        """
+        oldest = time.time() - self.ttl_seconds
+        reply = self._get_memory(key, oldest)
+        return reply if reply is not None else self._get_db(key, oldest)
+
+    async def aget(self, key):
+        """
+        get() for coroutines: memory hits are served inline, the SQLite lookup runs in a thread.
+        """
+        oldest = time.time() - self.ttl_seconds
+        reply = self._get_memory(key, oldest)
+        if reply is not None or self._db is None:
+            return reply if reply is not None else self._get_db(key, oldest)
+        return await asyncio.to_thread(self._get_db, key, oldest)
+
+    def put(self, key, reply):
+        created_at = time.time()
+        self._remember(key, reply, created_at)
+        metrics.increment("response_cache.stored")
+        if self._db is not None:
+            self._put_db(key, reply, created_at)
+
+    async def aput(self, key, reply):
+        """
+        put() for coroutines: the SQLite write runs in a thread.
+        """
+        created_at = time.time()
+        self._remember(key, reply, created_at)
+        metrics.increment("response_cache.stored")
+        if self._db is not None:
+            await asyncio.to_thread(self._put_db, key, reply, created_at)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def _remember(self, key, reply, created_at):
+        with self._lock:
+            self._entries[key] = (reply, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                metrics.increment("response_cache.evicted")
+            metrics.set_gauge("response_cache.entries", len(self._entries))
+
+    def _get_memory(self, key, oldest):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] > oldest:
+                self._entries.move_to_end(key)
+                metrics.increment("response_cache.hits")
+                return entry[0]
+            del self._entries[key]
+            metrics.increment("response_cache.expired")
+            return None
+
+    def _get_db(self, key, oldest):
+        reply = self._read_db(key, oldest)
+        if reply is None:
+            metrics.increment("response_cache.misses")
+            return None
+        metrics.increment("response_cache.hits")
+        metrics.increment("response_cache.db_hits")
+        self._remember(key, reply[0], reply[1])
+        return reply[0]
+
+    def _put_db(self, key, reply, created_at):
+        with self._db_lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, reply, created_at) VALUES (?, ?, ?)",
+                    (key, reply, created_at),
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Failed to write response cache entry {key}: {e}")
+            self._writes += 1
+            prune = self._writes % 256 == 0
+        if prune:
+            self._prune_db()
+
+    def _read_db(self, key, oldest):
+        if self._db is None:
+            return None
+        with self._db_lock:
+            try:
+                row = self._db.execute(
+                    "SELECT reply, created_at FROM responses WHERE key = ? AND created_at > ?", (key, oldest)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Failed to read response cache entry {key}: {e}")
+                return None
+        return row
+
+    def _prune_db(self):
+        with self._db_lock:
+            try:
+                self._db.execute("DELETE FROM responses WHERE created_at <= ?", (time.time() - self.ttl_seconds,))
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Failed to prune the response cache: {e}")
+
+
+# Shared by every session in the process; configured at startup
+response_cache = ResponseCache()
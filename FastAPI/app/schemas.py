@@ -1,9 +1,14 @@
 # app/schemas.py
+from typing import Literal, Optional
 from pydantic import BaseModel
 
 class ObjectiveRequest(BaseModel):
     objective: str
     target_language: str
+    user_language: str = "English"
+    country: Optional[str] = None
+    bypass_response_cache: bool = False  # Always call the model, even for repeated requests
 
 class MessageRequest(BaseModel):
     message: str
+    speaker: Optional[Literal["USER", "TARGET"]] = None  # Who typed the message, when the client knows
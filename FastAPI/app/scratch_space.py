@@ -0,0 +1,142 @@
+# app/scratch_space.py
+
+import io
+import os
+import shutil
+import tempfile
+import threading
+from uuid import uuid4
+
+from .metrics import metrics
+
+SHM_ROOT = "/dev/shm"
+
+_active_lock = threading.Lock()
+_active_count = 0
+
+
+def default_scratch_root():
+    """
+    Returns tmpfs (/dev/shm) when it is writable, otherwise None (system temp dir).
+    """
+    if os.path.isdir(SHM_ROOT) and os.access(SHM_ROOT, os.W_OK):
+        return SHM_ROOT
+    return None
+
+
+def _track_active(delta):
+    global _active_count
+    with _active_lock:
+        _active_count += delta
+        metrics.set_gauge("scratch.active", _active_count)
+
+
+class BufferView:
+    """
+    Zero-copy view of an in-memory scratch buffer (BytesIO.getbuffer()), passed to the DSP pool
+    in place of getvalue()'s copy. Pickling it for a worker process serializes the bytes then,
+    so no second copy of the upload is held while preprocessing runs.
+    """
+
+    __slots__ = ("view",)
+
+    def __init__(self, buf):
+        self.view = buf.getbuffer()
+
+    def __len__(self):
+        return self.view.nbytes
+
+    def __reduce__(self):
+        return bytes, (self.view.tobytes(),)
+
+    def release(self):
+        self.view.release()
+
+
+class ScratchSpace:
+    """
+    Unique, per-request scratch area for intermediate audio.
+
+    Buffers live in memory (io.BytesIO) when `in_memory` is set and otherwise as files in a
+    request-private directory on tmpfs, falling back to the system temp dir. Nothing is shared
+    between requests, so concurrent preprocessing jobs never collide on filenames, and
+    everything is removed when the context exits, whether or not an exception was raised.
+
+    Usage:
+        with ScratchSpace() as scratch:
+            upload = scratch.buffer("upload.wav")
+            ...
+    """
+
+    def __init__(self, root=None, in_memory=False, prefix="scratch-"):
+        self.root = root if root else default_scratch_root()
+        self.in_memory = in_memory
+        self.prefix = prefix
+        self.id = uuid4().hex
+        self._dir = None
+        self._buffers = []
+        self._views = []
+        self._closed = False
+        _track_active(1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    @property
+    def directory(self):
+        """
+        Request-private directory, created on first use.
+        """
+        if self._dir is None:
+            self._dir = tempfile.mkdtemp(prefix=f"{self.prefix}{self.id}-", dir=self.root)
+        return self._dir
+
+    def path(self, name):
+        """
+        Returns a filesystem path for tools that need a real file (e.g. ffmpeg).
+        """
+        return os.path.join(self.directory, os.path.basename(name))
+
+    def buffer(self, name):
+        """
+        Returns a readable/writable binary buffer owned by this scratch space.
+        """
+        if self.in_memory:
+            buf = io.BytesIO()
+        else:
+            buf = open(self.path(name), "w+b")
+        self._buffers.append(buf)
+        return buf
+
+    def source(self, buf):
+        """
+        Returns what to hand the decoder for a buffer: its path on disk, or a BufferView of it in memory.
+        """
+        if not self.in_memory:
+            return buf.name
+        view = BufferView(buf)
+        self._views.append(view)
+        return view
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        # A BytesIO with exported views cannot be closed
+        for view in self._views:
+            view.release()
+        self._views = []
+        for buf in self._buffers:
+            try:
+                buf.close()
+            except Exception as e:
+                print(f"Failed to close scratch buffer: {e}")
+        self._buffers = []
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+        _track_active(-1)
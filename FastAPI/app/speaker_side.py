@@ -0,0 +1,77 @@
+# app/speaker_side.py
+
+import time
+
+USER = "USER"
+TARGET = "TARGET"
+
+
+class SpeakerSide:
+    """
+    Which party spoke a turn, how sure the classifier is, and what the decision was based on:
+    'language_probs' (Whisper's language-ID distribution), 'language' (the decoded language only)
+    or 'expected' (turn order, when the language does not tell the sides apart).
+    """
+
+    def __init__(self, side, confidence, method, seconds=0.0):
+        self.side = side
+        self.confidence = confidence
+        self.method = method
+        self.seconds = seconds
+
+    def to_dict(self):
+        return {
+            "side": self.side,
+            "confidence": round(self.confidence, 3),
+            "method": self.method,
+            "ms": round(self.seconds * 1000, 3),
+        }
+
+
+class SpeakerSideClassifier:
+    """
+    Tags a transcribed turn as USER or TARGET side from the language Whisper heard, so the LLM
+    does not have to infer from the content who is speaking.
+
+    :param user_language: Whisper language code of the user.
+    :param target_language: Whisper language code of the target.
+    :param min_confidence: Below this share of the two sides' probability mass, the expected
+        speaker (from turn order) wins.
+    """
+
+    def __init__(self, user_language, target_language, min_confidence=0.6):
+        self.user_language = user_language
+        self.target_language = target_language
+        self.min_confidence = min_confidence
+
+    def classify(self, result, expected=None):
+        """
+        :param result: TranscriptionResult of the turn.
+        :param expected: 'user' or 'target' side expected from turn order, or None.
+        :return: SpeakerSide.
+        """
+        started_at = time.perf_counter()
+        side = self._classify(result, expected)
+        side.seconds = time.perf_counter() - started_at
+        return side
+
+    def _classify(self, result, expected):
+        fallback = TARGET if expected == "target" else USER
+        if not self.user_language or not self.target_language or self.user_language == self.target_language:
+            return SpeakerSide(fallback, 0.5, "expected")
+
+        if result.language_probs:
+            user_prob = result.language_probs.get(self.user_language, 0.0)
+            target_prob = result.language_probs.get(self.target_language, 0.0)
+            if user_prob + target_prob > 0:
+                side = USER if user_prob >= target_prob else TARGET
+                confidence = max(user_prob, target_prob) / (user_prob + target_prob)
+                if confidence >= self.min_confidence or expected is None:
+                    return SpeakerSide(side, confidence, "language_probs")
+                return SpeakerSide(fallback, confidence, "expected")
+
+        if result.language == self.user_language:
+            return SpeakerSide(USER, 1.0, "language")
+        if result.language == self.target_language:
+            return SpeakerSide(TARGET, 1.0, "language")
+        return SpeakerSide(fallback, 0.5, "expected")
@@ -0,0 +1,89 @@
+# app/speech_gate.py
+
+import numpy as np
+
+from .metrics import metrics
+
+
+def level_dbfs(audio):
+    """
+    RMS level of float32 audio in dBFS (-inf for digital silence).
+    """
+    if not len(audio):
+        return float("-inf")
+    rms = float(np.sqrt(np.mean(np.square(audio, dtype=np.float64))))
+    return float(20 * np.log10(rms)) if rms > 0 else float("-inf")
+
+
+class GateDecision:
+    """
+    Outcome of one speech-gate check. `reason` is None when the clip passed.
+    """
+
+    def __init__(self, stage, reason=None, detail=None):
+        self.stage = stage  # 'audio' (before Whisper) or 'transcript' (after)
+        self.reason = reason
+        self.detail = detail if detail else {}
+
+    @property
+    def passed(self):
+        return self.reason is None
+
+    def to_dict(self):
+        return {"stage": self.stage, "reason": self.reason, **self.detail}
+
+
+class SpeechGate:
+    """
+    Rejects clips that hold no speech before any LLM work: accidental taps, room noise and the
+    text Whisper hallucinates on them.
+
+    check_audio runs before transcription on the raw level (measured before normalization, which
+    would amplify a silent clip) and the VAD's voiced duration; check_transcription runs after it
+    on Whisper's no-speech probability and on transcripts without any words.
+    """
+
+    def __init__(self, min_level_dbfs=-55.0, min_speech_seconds=0.25, no_speech_threshold=0.6,
+                 logprob_threshold=-1.0, enabled=True):
+        self.min_level_dbfs = min_level_dbfs
+        self.min_speech_seconds = min_speech_seconds
+        self.no_speech_threshold = no_speech_threshold
+        self.logprob_threshold = logprob_threshold
+        self.enabled = enabled
+
+    def check_audio(self, level, vad_stats):
+        """
+        :param level: RMS level of the decoded clip in dBFS.
+        :param vad_stats: VADStats of the clip.
+        :return: GateDecision.
+        """
+        detail = {"level_dbfs": round(level, 1) if np.isfinite(level) else None,
+                  "voiced_seconds": round(vad_stats.voiced_seconds, 3)}
+        if not vad_stats.voiced_seconds:
+            return self._record(GateDecision("audio", "no_voiced_audio", detail))
+        if not self.enabled:
+            return GateDecision("audio", detail=detail)
+        if level < self.min_level_dbfs:
+            return self._record(GateDecision("audio", "too_quiet", detail))
+        if vad_stats.voiced_seconds < self.min_speech_seconds:
+            return self._record(GateDecision("audio", "too_little_speech", detail))
+        return GateDecision("audio", detail=detail)
+
+    def check_transcription(self, transcription):
+        """
+        :param transcription: TranscriptionResult of the clip.
+        :return: GateDecision.
+        """
+        detail = {"no_speech_prob": transcription.to_dict()["no_speech_prob"]}
+        if not any(ch.isalnum() for ch in transcription.text):
+            return self._record(GateDecision("transcript", "empty_transcript", detail))
+        if self.enabled and transcription.is_silence(self.no_speech_threshold, self.logprob_threshold):
+            return self._record(GateDecision("transcript", "no_speech", detail))
+        metrics.increment("speech_gate.passed")
+        return GateDecision("transcript", detail=detail)
+
+    def _record(self, decision):
+        metrics.increment("speech_gate.rejected")
+        metrics.increment(f"speech_gate.rejected.{decision.reason}")
+        metrics.record_event("speech_gate.rejected", decision.to_dict())
+        return decision
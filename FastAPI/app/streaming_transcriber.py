@@ -0,0 +1,264 @@
+# app/streaming_transcriber.py
+
+import asyncio
+import contextlib
+import time
+
+import numpy as np
+
+from .metrics import metrics
+from .worker_pools import OverloadedError
+from .utils import merge_overlapping_text
+
+SUPPORTED_FORMATS = ("pcm_s16le", "pcm_f32le", "opus")
+
+
+class PcmDecoder:
+    """
+    Converts raw little-endian PCM chunks into float32 samples.
+    """
+
+    def __init__(self, sample_format="pcm_s16le"):
+        self.sample_format = sample_format
+        self._remainder = b""
+
+    async def decode(self, chunk):
+        data = self._remainder + chunk
+        sample_size = 2 if self.sample_format == "pcm_s16le" else 4
+        usable = len(data) - len(data) % sample_size
+        self._remainder = data[usable:]
+        if self.sample_format == "pcm_s16le":
+            return np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+        return np.frombuffer(data[:usable], dtype="<f4").astype(np.float32)
+
+    async def close(self):
+        return np.zeros(0, dtype=np.float32)
+
+
+class OpusStreamDecoder:
+    """
+    Decodes a WebM/Ogg Opus stream (as produced by MediaRecorder) through one long-lived ffmpeg
+    process per connection: chunks go to ffmpeg's stdin and 16 kHz mono float32 PCM is read back
+    from its stdout.
+    """
+
+    def __init__(self, sample_rate=16000):
+        self.sample_rate = sample_rate
+        self._process = None
+        self._pcm = PcmDecoder("pcm_f32le")
+
+    async def _ensure_process(self):
+        if self._process is None:
+            self._process = await asyncio.create_subprocess_exec(
+                "ffmpeg", "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+                "-f", "f32le", "-ac", "1", "-ar", str(self.sample_rate), "pipe:1",
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+            )
+
+    async def decode(self, chunk):
+        await self._ensure_process()
+        self._process.stdin.write(chunk)
+        await self._process.stdin.drain()
+        return await self._read_available()
+
+    async def _read_available(self, timeout=0.01):
+        # ffmpeg emits PCM asynchronously; collect whatever is ready without blocking the stream
+        collected = []
+        while True:
+            try:
+                data = await asyncio.wait_for(self._process.stdout.read(65536), timeout)
+            except asyncio.TimeoutError:
+                break
+            if not data:
+                break
+            collected.append(await self._pcm.decode(data))
+        return np.concatenate(collected) if collected else np.zeros(0, dtype=np.float32)
+
+    async def close(self):
+        if self._process is None:
+            return np.zeros(0, dtype=np.float32)
+        process, self._process = self._process, None
+        process.stdin.close()
+        remaining = await process.stdout.read()
+        await process.wait()
+        return await self._pcm.decode(remaining)
+
+
+def create_decoder(sample_format, sample_rate=16000):
+    if sample_format not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported audio format '{sample_format}', expected one of {SUPPORTED_FORMATS}.")
+    if sample_format == "opus":
+        return OpusStreamDecoder(sample_rate)
+    return PcmDecoder(sample_format)
+
+
+class StreamingTranscriber:
+    """
+    Maintains the rolling audio buffer of one streaming connection and turns it into partial and
+    finalized transcript events.
+
+    Audio is accumulated per utterance. Every `step_seconds` of new audio the trailing
+    `window_seconds` are decoded and emitted as a partial result. An utterance is finalized
+    after `silence_ms` of trailing silence, or forcibly once it reaches `max_utterance_seconds`;
+    in that case the last `overlap_seconds` are carried into the next utterance so no word is
+    cut at the boundary, and the repeated words are removed from the next final transcript.
+    """
+
+    def __init__(
+        self,
+        batch_transcriber,
+        sample_rate=16000,
+        window_seconds=10.0,
+        step_seconds=1.0,
+        overlap_seconds=1.0,
+        max_utterance_seconds=25.0,
+        silence_ms=700,
+        energy_threshold_db=-40.0,
+        frame_ms=20,
+        speech_gate=None,
+        asr_stage=None,
+    ):
+        self.batch_transcriber = batch_transcriber
+        self.asr_stage = asr_stage  # worker_pools.asr: streaming decodes obey the same admission limits
+        self.speech_gate = speech_gate  # Drops finalized utterances Whisper judges as no speech
+        self.sample_rate = sample_rate
+        self.window_samples = int(window_seconds * sample_rate)
+        self.step_samples = int(step_seconds * sample_rate)
+        self.overlap_samples = int(overlap_seconds * sample_rate)
+        self.max_utterance_samples = int(max_utterance_seconds * sample_rate)
+        self.silence_frames = max(1, int(silence_ms / frame_ms))
+        self.frame_samples = int(frame_ms * sample_rate / 1000)
+        self.energy_threshold = 10 ** (energy_threshold_db / 20.0)
+
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._pending_frame = np.zeros(0, dtype=np.float32)
+        self._speech_started = False
+        self._trailing_silent_frames = 0
+        self._samples_since_partial = 0
+        self._stream_offset = 0  # Samples finalized before the current utterance
+        self._utterance_id = 0
+        self._last_final_text = ""
+        self.last_transcription = None  # TranscriptionResult behind the latest final event
+        self._partial_task = None
+
+    def feed(self, samples):
+        """
+        Appends decoded samples and returns whether the current utterance should be finalized.
+        """
+        self._buffer = np.concatenate([self._buffer, samples])
+        self._samples_since_partial += len(samples)
+
+        frames = np.concatenate([self._pending_frame, samples])
+        usable = len(frames) - len(frames) % self.frame_samples
+        self._pending_frame = frames[usable:]
+        if usable:
+            rms = np.sqrt(np.mean(frames[:usable].reshape(-1, self.frame_samples) ** 2, axis=1))
+            for voiced in rms > self.energy_threshold:
+                if voiced:
+                    self._speech_started = True
+                    self._trailing_silent_frames = 0
+                elif self._speech_started:
+                    self._trailing_silent_frames += 1
+
+        if len(self._buffer) >= self.max_utterance_samples:
+            return True
+        return self._speech_started and self._trailing_silent_frames >= self.silence_frames
+
+    def partial_due(self):
+        return (
+            self._speech_started
+            and self._samples_since_partial >= self.step_samples
+            and (self._partial_task is None or self._partial_task.done())
+        )
+
+    def start_partial(self, send_event):
+        """
+        Decodes the trailing window in the background; skipped while a previous partial is running.
+        """
+        self._samples_since_partial = 0
+        window = self._buffer[-self.window_samples:]
+        utterance_id = self._utterance_id
+
+        async def run_partial():
+            started_at = time.perf_counter()
+            try:
+                async with self._asr_slot():
+                    text = (await self.batch_transcriber.transcribe(window)).text
+            except OverloadedError:
+                # Partials are best-effort: skip this one rather than add to an overloaded stage
+                metrics.increment("streaming.partial_rejected")
+                return
+            metrics.observe("streaming.partial_seconds", time.perf_counter() - started_at)
+            if text and utterance_id == self._utterance_id:
+                await send_event({"type": "partial", "utterance_id": utterance_id, "text": text})
+
+        self._partial_task = asyncio.create_task(run_partial())
+        self._partial_task.add_done_callback(self._partial_done)
+
+    @staticmethod
+    def _partial_done(task):
+        if not task.cancelled() and task.exception() is not None:
+            metrics.increment("streaming.partial_errors")
+            print(f"Partial transcription failed: {task.exception()!r}")
+
+    def _asr_slot(self):
+        return self.asr_stage.slot() if self.asr_stage is not None else contextlib.nullcontext()
+
+    async def cancel_partial(self):
+        """
+        Cancels the running partial decode, if any, and waits for it to finish.
+        """
+        task, self._partial_task = self._partial_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def finalize(self):
+        """
+        Transcribes the current utterance and resets the buffer.
+
+        :return: Final event dict, or None when the utterance held no speech.
+        """
+        await self.cancel_partial()
+
+        audio = self._buffer
+        forced = len(audio) >= self.max_utterance_samples and self._trailing_silent_frames < self.silence_frames
+        had_speech = self._speech_started
+        utterance_id = self._utterance_id
+        start = self._stream_offset / self.sample_rate
+        end = (self._stream_offset + len(audio)) / self.sample_rate
+
+        carried = audio[-self.overlap_samples:] if forced and self.overlap_samples else np.zeros(0, dtype=np.float32)
+        self._stream_offset += len(audio) - len(carried)
+        self._buffer = carried.copy()
+        self._speech_started = forced
+        self._trailing_silent_frames = 0
+        self._samples_since_partial = 0
+        self._utterance_id += 1
+
+        if not had_speech or not len(audio):
+            return None
+
+        started_at = time.perf_counter()
+        async with self._asr_slot():
+            transcription = await self.batch_transcriber.transcribe(audio)
+        metrics.observe("streaming.final_seconds", time.perf_counter() - started_at)
+        if self.speech_gate is not None and not self.speech_gate.check_transcription(transcription).passed:
+            self._last_final_text = ""
+            return None
+        text = transcription.text
+        text = merge_overlapping_text(self._last_final_text, text) if self._last_final_text else text
+        self._last_final_text = text if forced else ""
+        if not text:
+            return None
+        self.last_transcription = transcription
+        metrics.increment("streaming.utterances")
+        return {
+            "type": "final",
+            "utterance_id": utterance_id,
+            "text": text,
+            "start": round(start, 3),
+            "end": round(end, 3),
+        }
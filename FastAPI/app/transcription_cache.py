@@ -0,0 +1,215 @@
+# app/transcription_cache.py
+
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .metrics import metrics
+
+
+def pcm_digest(audio):
+    """
+    Content hash of decoded float32 PCM, independent of the container it was uploaded in.
+    """
+    audio = np.ascontiguousarray(audio, dtype=np.float32)
+    return hashlib.blake2b(audio.data, digest_size=20).hexdigest()
+
+
+class ByteBudgetCache:
+    """
+    Thread-safe LRU whose capacity is a byte budget rather than an entry count, with an optional
+    on-disk tier that survives restarts. Values are pickled to measure (and store) them; disk
+    entries are promoted back into memory on a hit.
+
+    :param name: Metrics prefix.
+    :param max_bytes: Memory budget; 0 disables the memory tier.
+    :param disk_dir: Directory for the disk tier, or None.
+    :param max_disk_bytes: Disk budget; the least recently written files are removed beyond it.
+    """
+
+    def __init__(self, name, max_bytes=0, disk_dir=None, max_disk_bytes=0):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._bytes = 0
+        self._disk_bytes = None  # Measured lazily on the first disk write
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 or bool(self.disk_dir)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                metrics.increment(f"{self.name}.hits")
+                return entry[0]
+
+        value = self._read_disk(key)
+        if value is None:
+            metrics.increment(f"{self.name}.misses")
+            return None
+        metrics.increment(f"{self.name}.disk_hits")
+        self.put(key, value, write_disk=False)
+        return value
+
+    def put(self, key, value, nbytes=None, write_disk=True):
+        data = None
+        if nbytes is None or (write_disk and self.disk_dir):
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            nbytes = nbytes if nbytes is not None else len(data)
+        if write_disk and self.disk_dir:
+            self._write_disk(key, data)
+        if nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._bytes -= evicted_bytes
+                metrics.increment(f"{self.name}.evicted")
+            metrics.set_gauge(f"{self.name}.entries", len(self._entries))
+            metrics.set_gauge(f"{self.name}.bytes", self._bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.pkl")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Failed to read {self.name} entry {key}: {e}")
+            return None
+
+    def _write_disk(self, key, data):
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Failed to write {self.name} entry {key}: {e}")
+            return
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+            else:
+                self._disk_bytes += len(data)
+            if self.max_disk_bytes and self._disk_bytes > self.max_disk_bytes:
+                self._trim_disk()
+
+    def _disk_files(self):
+        files = []
+        for directory, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if name.endswith(".pkl"):
+                    path = os.path.join(directory, name)
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _trim_disk(self):
+        files = sorted(self._disk_files())
+        self._disk_bytes = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                self._disk_bytes -= size
+                metrics.increment(f"{self.name}.disk_evicted")
+            except OSError:
+                pass
+
+
+class TranscriptionCache:
+    """
+    Transcripts keyed by a hash of the decoded PCM plus the model variant and decoding options,
+    so replayed or retried uploads skip preprocessing and Whisper entirely.
+    """
+
+    def __init__(self, max_bytes=0, disk_dir=None, max_disk_bytes=0):
+        self.store = ByteBudgetCache("transcription_cache", max_bytes, disk_dir, max_disk_bytes)
+
+    @property
+    def enabled(self):
+        return self.store.enabled
+
+    def configure(self, max_bytes, disk_dir=None, max_disk_bytes=0):
+        self.store = ByteBudgetCache("transcription_cache", max_bytes, disk_dir, max_disk_bytes)
+
+    @staticmethod
+    def key(audio_digest, variant, options=None):
+        return hashlib.blake2b(f"{audio_digest}|{variant}|{options!r}".encode(), digest_size=20).hexdigest()
+
+    def get(self, audio_digest, variants, options=None):
+        """
+        Looks the audio up for each model variant in order of preference.
+
+        :param variants: Model variant tags, best first (see ModelTier.cache_variant).
+        :return: The cached entry, or None.
+        """
+        for variant in variants:
+            entry = self.store.get(self.key(audio_digest, variant, options))
+            if entry is not None:
+                return entry
+        return None
+
+    def put(self, audio_digest, variant, entry, options=None):
+        self.store.put(self.key(audio_digest, variant, options), entry)
+
+
+class EncoderFeatureCache:
+    """
+    Whisper encoder outputs keyed by a hash of the 30-second window fed to the encoder, so
+    re-decoding the same audio (other options, a language-hint retry) skips the encoder.
+    Memory only: features are several MB per window for the larger models.
+    """
+
+    def __init__(self, max_bytes=0):
+        self.store = ByteBudgetCache("encoder_cache", max_bytes)
+
+    @property
+    def enabled(self):
+        return self.store.enabled
+
+    def configure(self, max_bytes):
+        self.store = ByteBudgetCache("encoder_cache", max_bytes)
+
+    def get(self, audio, variant):
+        return self.store.get(TranscriptionCache.key(pcm_digest(audio), variant))
+
+    def put(self, audio, variant, features):
+        self.store.put(
+            TranscriptionCache.key(pcm_digest(audio), variant), features, features.numel() * features.element_size()
+        )
+
+
+# Process-wide caches, sized at startup from config (disabled until then)
+transcription_cache = TranscriptionCache()
+encoder_feature_cache = EncoderFeatureCache()
@@ -1,17 +1,125 @@
 # app/transcription_handler.py
 
+import time
+from dataclasses import dataclass, fields, replace
+
 import torch
 import whisper
+from whisper.decoding import DecodingResult
+
+from .metrics import metrics
+from .model_registry import model_registry
+from .transcription_cache import encoder_feature_cache
+from .transcription_result import TranscriptionResult
+from .word_timing import align_words
+
+@dataclass(frozen=True)
+class TimedDecodingResult(DecodingResult):
+    """
+    DecodingResult with word timings: (word, start, end, probability) tuples, times in seconds.
+    """
+    words: tuple = ()
 
 class TranscriptionHandler:
-    def __init__(self, model_name='large', device=None):
-        self.device = device if device else ("cuda" if torch.cuda.is_available() else "cpu")
-        print(f"Using device: {self.device}")
-        print("Loading Whisper model...")
-        self.model = whisper.load_model(model_name).to(self.device)
-        print("Whisper model loaded.")
-
-    def transcribe(self, audio_path):
+    def __init__(self, model_name='large', device=None, dtype=None, registry=None, feature_cache=None):
+        registry = registry if registry else model_registry
+        self.feature_cache = feature_cache if feature_cache else encoder_feature_cache
+        # The registry loads each model once per process, so handlers are cheap to construct
+        self.loaded_model = registry.get(model_name, device=device, dtype=dtype)
+        self.model = self.loaded_model.model
+        self.device = self.loaded_model.device
+        print(f"Using Whisper '{model_name}' on device: {self.device}")
+
+    def warm_up(self):
+        return self.loaded_model.warm_up()
+
+    def default_options(self, **overrides):
+        """
+        Returns the DecodingOptions used for single-window (batched) decoding.
+        """
+        options = {"task": "transcribe", "without_timestamps": True, "fp16": self.loaded_model.fp16}
+        options.update(overrides)
+        return whisper.DecodingOptions(**options)
+
+    def encode_batch(self, audios):
+        """
+        Runs the Whisper encoder over clips of at most 30 seconds. With the encoder feature cache
+        enabled, only clips it has not seen are encoded.
+
+        :param audios: List of 16 kHz float32 arrays.
+        :return: Audio features tensor of shape (n_clips, n_audio_ctx, n_audio_state).
+        """
+        if not self.feature_cache.enabled:
+            return self._encode(audios)
+
+        variant = f"{self.loaded_model.model_name}/{self.loaded_model.dtype}"
+        features = [self.feature_cache.get(audio, variant) for audio in audios]
+        missing = [i for i, f in enumerate(features) if f is None]
+        if missing:
+            encoded = self._encode([audios[i] for i in missing])
+            for i, f in zip(missing, encoded):
+                features[i] = f
+                self.feature_cache.put(audios[i], variant, f.clone())
+        return torch.stack(features)
+
+    def _encode(self, audios):
+        mels = [
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(audio)), n_mels=self.model.dims.n_mels)
+            for audio in audios
+        ]
+        return self.loaded_model.encode(torch.stack(mels).to(self.device))
+
+    def decode_batch(self, audios, options=None, language_probs=False, word_timestamps=False):
+        """
+        Decodes several clips of at most 30 seconds in a single batched Whisper forward pass.
+
+        :param audios: List of 16 kHz float32 arrays.
+        :param options: whisper.DecodingOptions shared by the whole batch.
+        :param language_probs: Also run language identification on the encoder output (one extra
+            decoder step) and attach the per-clip probabilities, even when options.language is set.
+        :param word_timestamps: Align the decoded tokens to the audio (one teacher-forced decoder
+            pass over the same encoder output) and return TimedDecodingResults.
+        :return: List of whisper DecodingResult, one per clip.
+        """
+        options = options if options else self.default_options()
+        audio_features = self.encode_batch(audios)
+        with self.loaded_model.inference():
+            results = whisper.decode(self.model, audio_features, options)
+            if language_probs:
+                started_at = time.perf_counter()
+                _, probs = self.model.detect_language(audio_features)
+                metrics.observe("speaker.language_id_seconds", time.perf_counter() - started_at)
+                results = [replace(result, language_probs=p) for result, p in zip(results, probs)]
+        if word_timestamps:
+            started_at = time.perf_counter()
+            num_frames = [min(len(audio), whisper.audio.N_SAMPLES) // whisper.audio.HOP_LENGTH for audio in audios]
+            with self.loaded_model.inference():
+                words = align_words(self.model, results, audio_features, num_frames, task=options.task)
+            metrics.observe("transcription.word_alignment_seconds", time.perf_counter() - started_at)
+            results = [
+                TimedDecodingResult(**{f.name: getattr(result, f.name) for f in fields(result)}, words=tuple(w))
+                for result, w in zip(results, words)
+            ]
+        return results
+
+    def transcribe(self, audio):
+        """
+        Transcribes a file path or 16 kHz float32 array of any length.
+        """
         print("Transcribing with Whisper...")
-        result = self.model.transcribe(audio_path)
+        with self.loaded_model.inference():
+            result = self.model.transcribe(audio, fp16=self.loaded_model.fp16)
         return result['text']
+
+    def transcribe_result(self, audio, language=None, word_timestamps=False):
+        """
+        Sequential transcription of audio of any length, returning a TranscriptionResult.
+
+        :param language: Whisper language code; None runs language detection.
+        :param word_timestamps: Also return word timings.
+        """
+        with self.loaded_model.inference():
+            output = self.model.transcribe(
+                audio, language=language, fp16=self.loaded_model.fp16, word_timestamps=word_timestamps
+            )
+        return TranscriptionResult.from_transcribe(output)
@@ -0,0 +1,176 @@
+# app/transcription_result.py
+
+from .long_form import stitch_chunks
+
+
+def _mean_probs(probs, weights):
+    probs = [(p, w) for p, w in zip(probs, weights) if p]
+    if not probs:
+        return None
+    total = sum(w for _, w in probs)
+    return {code: sum(p[code] * w for p, w in probs) / total for code in probs[0][0]}
+
+
+def _round(value, digits):
+    return None if value is None else round(float(value), digits)
+
+
+class TranscriptionResult:
+    """
+    Structured output of one transcription, independent of whether it came from a batched
+    single-window decode, stitched long-form chunks or Whisper's sequential transcribe.
+
+    Segments are dicts with 'start', 'end' (seconds), 'text', 'avg_logprob' and 'no_speech_prob';
+    words are (word, start, end, probability) tuples, present when word timestamps were requested.
+    """
+
+    def __init__(self, text, language=None, avg_logprob=None, no_speech_prob=None, language_probs=None,
+                 segments=None, words=None, language_hint=None, hint_accepted=False):
+        self.text = text
+        self.language = language
+        self.avg_logprob = avg_logprob
+        self.no_speech_prob = no_speech_prob
+        self.language_probs = language_probs  # Only set when Whisper ran language detection
+        self.segments = segments if segments else []
+        self.words = list(words) if words else []
+        self.language_hint = language_hint
+        self.hint_accepted = hint_accepted
+
+    @classmethod
+    def from_decoding(cls, result, duration=None):
+        """
+        Builds a result from a whisper DecodingResult (or TimedDecodingResult) of one clip.
+
+        :param duration: Length of the clip in seconds, for its single segment.
+        """
+        text = result.text.strip()
+        words = getattr(result, "words", ())
+        end = duration if duration is not None else (words[-1][2] if words else 0.0)
+        return cls(
+            text=text,
+            language=result.language,
+            avg_logprob=result.avg_logprob,
+            no_speech_prob=result.no_speech_prob,
+            language_probs=result.language_probs,
+            segments=[_segment(0.0, end, text, result)] if text else [],
+            words=words,
+        )
+
+    @classmethod
+    def from_chunks(cls, chunks, results, sample_rate=16000):
+        """
+        Combines the DecodingResults of long-form chunks; log-probabilities are averaged weighted
+        by token count and the language is the one most chunks were decoded in. Word times are
+        shifted to the full recording, dropping words repeated in the overlap of hard splits.
+        """
+        stitched = stitch_chunks(chunks, [r.text for r in results], sample_rate)
+        by_start = {round(c.start / sample_rate, 3): r for c, r in zip(chunks, results)}
+        weights = [max(1, len(r.tokens)) for r in results]
+        languages = [r.language for r in results]
+
+        words, previous_end = [], 0.0
+        for chunk, result in zip(chunks, results):
+            offset = chunk.start / sample_rate
+            for word, start, end, probability in getattr(result, "words", ()):
+                if chunk.overlaps_previous and offset + start < previous_end:
+                    continue
+                words.append((word, offset + start, offset + end, probability))
+            previous_end = chunk.end / sample_rate
+
+        return cls(
+            text=stitched["text"],
+            language=max(set(languages), key=languages.count) if languages else None,
+            avg_logprob=sum(r.avg_logprob * w for r, w in zip(results, weights)) / sum(weights) if results else None,
+            no_speech_prob=min((r.no_speech_prob for r in results), default=None),
+            language_probs=_mean_probs([r.language_probs for r in results], weights),
+            segments=[
+                _segment(s["start"], s["end"], s["text"], by_start.get(s["start"])) for s in stitched["segments"]
+            ],
+            words=words,
+        )
+
+    @classmethod
+    def from_transcribe(cls, output):
+        """
+        Builds a result from the dict returned by whisper's model.transcribe.
+        """
+        segments = output.get("segments", [])
+        return cls(
+            text=output["text"].strip(),
+            language=output.get("language"),
+            avg_logprob=sum(s["avg_logprob"] for s in segments) / len(segments) if segments else None,
+            no_speech_prob=min((s["no_speech_prob"] for s in segments), default=None),
+            segments=[
+                {
+                    "start": s["start"],
+                    "end": s["end"],
+                    "text": s["text"].strip(),
+                    "avg_logprob": s["avg_logprob"],
+                    "no_speech_prob": s["no_speech_prob"],
+                }
+                for s in segments
+            ],
+            words=[
+                (w["word"].strip(), w["start"], w["end"], w["probability"])
+                for s in segments
+                for w in s.get("words", [])
+                if w["word"].strip()
+            ],
+        )
+
+    def map_times(self, clip_time):
+        """
+        Re-expresses segment and word times through `clip_time`, e.g. VADStats.clip_time to turn
+        times in the voiced audio Whisper heard into times in the uploaded clip.
+
+        :return: self.
+        """
+        for segment in self.segments:
+            segment["start"], segment["end"] = clip_time(segment["start"]), clip_time(segment["end"])
+        self.words = [
+            (word, clip_time(start), clip_time(end), probability) for word, start, end, probability in self.words
+        ]
+        return self
+
+    def is_silence(self, no_speech_threshold=0.6, logprob_threshold=-1.0):
+        """
+        Whisper's own no-speech rule: the no-speech probability is high and the decoded text is
+        not confident enough to override it.
+        """
+        if self.no_speech_prob is None or self.no_speech_prob <= no_speech_threshold:
+            return False
+        return self.avg_logprob is None or self.avg_logprob <= logprob_threshold
+
+    def to_dict(self):
+        """
+        Compact JSON form: rounded numbers, and words as [word, start, end, probability] arrays.
+        """
+        return {
+            "text": self.text,
+            "language": self.language,
+            "avg_logprob": _round(self.avg_logprob, 3),
+            "no_speech_prob": _round(self.no_speech_prob, 3),
+            "language_hint": self.language_hint,
+            "hint_accepted": self.hint_accepted,
+            "segments": [
+                {
+                    "start": _round(s["start"], 2),
+                    "end": _round(s["end"], 2),
+                    "text": s["text"],
+                    "avg_logprob": _round(s.get("avg_logprob"), 3),
+                    "no_speech_prob": _round(s.get("no_speech_prob"), 3),
+                }
+                for s in self.segments
+            ],
+            "words": [[w, round(start, 2), round(end, 2), round(p, 3)] for w, start, end, p in self.words],
+        }
+
+
+def _segment(start, end, text, result):
+    return {
+        "start": start,
+        "end": end,
+        "text": text,
+        "avg_logprob": result.avg_logprob if result is not None else None,
+        "no_speech_prob": result.no_speech_prob if result is not None else None,
+    }
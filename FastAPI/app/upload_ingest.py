@@ -0,0 +1,173 @@
+# app/upload_ingest.py
+
+import struct
+import time
+
+from starlette.responses import JSONResponse
+
+from .metrics import metrics
+
+HEADER_PROBE_BYTES = 4096
+# Allowance for multipart boundaries, part headers and other form fields on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """
+    Raised while spooling an upload that exceeds the size or duration limits (HTTP 413).
+    """
+
+
+def wav_duration(header):
+    """
+    Reads the duration of a WAV file from its first bytes, or returns None when the header is
+    not a complete PCM WAV header (streamed WAVs often carry a placeholder data size).
+    """
+    if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return None
+    offset = 12
+    byte_rate = None
+    while offset + 8 <= len(header):
+        chunk_id, chunk_size = header[offset:offset + 4], struct.unpack("<I", header[offset + 4:offset + 8])[0]
+        if chunk_id == b"fmt " and offset + 20 <= len(header):
+            byte_rate = struct.unpack("<I", header[offset + 16:offset + 20])[0]
+        elif chunk_id == b"data":
+            if not byte_rate or chunk_size in (0, 0xFFFFFFFF):
+                return None
+            return chunk_size / byte_rate
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+class IngestStats:
+    def __init__(self, total_bytes, seconds, declared_duration):
+        self.total_bytes = total_bytes
+        self.seconds = seconds
+        self.declared_duration = declared_duration
+
+    @property
+    def bytes_per_second(self):
+        return self.total_bytes / self.seconds if self.seconds else None
+
+
+async def spool_upload(upload_file, destination, max_bytes, max_seconds=None, chunk_size=64 * 1024):
+    """
+    Copies an UploadFile into `destination` in fixed-size chunks, so the upload is never held in
+    memory as a single bytes object. Limits are enforced as early as possible: the declared
+    size before reading, a WAV header's duration after the first chunk, and the running byte
+    count on every chunk.
+
+    :param upload_file: FastAPI UploadFile.
+    :param destination: Writable binary buffer (e.g. from ScratchSpace.buffer).
+    :param max_bytes: Maximum upload size in bytes.
+    :param max_seconds: Maximum audio duration, checked here when the WAV header declares it.
+    :return: IngestStats.
+    """
+    declared_size = getattr(upload_file, "size", None)
+    if declared_size is not None and declared_size > max_bytes:
+        metrics.increment("upload.rejected_size")
+        raise UploadTooLargeError(f"Upload is {declared_size} bytes, the maximum is {max_bytes} bytes.")
+
+    started_at = time.perf_counter()
+    total_bytes = 0
+    header = b""
+    declared_duration = None
+    while True:
+        chunk = await upload_file.read(chunk_size)
+        if not chunk:
+            break
+        total_bytes += len(chunk)
+        if total_bytes > max_bytes:
+            metrics.increment("upload.rejected_size")
+            raise UploadTooLargeError(f"Upload exceeds the maximum of {max_bytes} bytes.")
+
+        if len(header) < HEADER_PROBE_BYTES:
+            header += chunk[:HEADER_PROBE_BYTES - len(header)]
+            if declared_duration is None and len(header) >= 44:
+                declared_duration = wav_duration(header)
+                if max_seconds is not None and declared_duration is not None and declared_duration > max_seconds:
+                    metrics.increment("upload.rejected_duration")
+                    raise UploadTooLargeError(
+                        f"Audio is {declared_duration:.1f}s long, the maximum is {max_seconds:.0f}s."
+                    )
+        destination.write(chunk)
+
+    destination.flush()
+    stats = IngestStats(total_bytes, time.perf_counter() - started_at, declared_duration)
+    metrics.observe("upload.bytes", total_bytes)
+    if stats.bytes_per_second:
+        metrics.observe("upload.ingest_bytes_per_second", stats.bytes_per_second)
+    return stats
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware that bounds request bodies on upload routes while they are still arriving.
+    Starlette parses (and spools to disk) the whole multipart body before the endpoint runs, so
+    spool_upload's checks alone would accept an oversized upload in full before rejecting it.
+    Here a declared Content-Length over the limit is refused before the body is read, and the
+    bytes actually received are counted, answering 413 as soon as they exceed it.
+
+    :param max_body_bytes: Largest accepted request body, multipart framing included.
+    :param path_prefixes: Routes the limit applies to.
+    """
+
+    def __init__(self, app, max_body_bytes, path_prefixes=("/process_audio",)):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.path_prefixes = tuple(path_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        try:
+            declared = int(headers.get(b"content-length", b""))
+        except ValueError:
+            declared = None
+        if declared is not None and declared > self.max_body_bytes:
+            metrics.increment("upload.rejected_declared_size")
+            await self._reject(scope, send)
+            return
+
+        received = 0
+        rejected = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    rejected = True
+                    raise UploadTooLargeError(f"Upload exceeds the {self.max_body_bytes} byte limit.")
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if rejected:
+                return  # The app's reply to the aborted body is replaced by the 413 below
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not rejected:
+                raise
+        if rejected and not response_started:
+            metrics.increment("upload.rejected_streamed_size")
+            await self._reject(scope, send)
+
+    async def _reject(self, scope, send):
+        response = JSONResponse(
+            {"detail": f"Upload exceeds the {self.max_body_bytes} byte limit."}, status_code=413
+        )
+        await response(scope, self._empty_receive, send)
+
+    @staticmethod
+    async def _empty_receive():
+        return {"type": "http.disconnect"}
@@ -1,5 +1,7 @@
 # app/utils.py
 
+import re
+
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -31,3 +33,51 @@ def initialize_language_model():
         temperature=0
     )
     return model
+
+# Scripts written without spaces between words; their text is compared one character at a time
+CJK_PATTERN = r"\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_TOKEN_RE = re.compile(rf"[{CJK_PATTERN}]|[^\s{CJK_PATTERN}]+")
+_CJK_RE = re.compile(rf"[{CJK_PATTERN}]")
+
+
+def _overlap_tokens(text):
+    """
+    Splits text into comparable units: whitespace-separated words, and single characters for
+    CJK. Punctuation-only units are dropped.
+
+    :return: List of (normalized token, end offset in `text`).
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(text):
+        token = match.group().strip(".,!?;:。，！？、").lower()
+        if token:
+            tokens.append((token, match.end()))
+    return tokens
+
+
+def merge_overlapping_text(previous_text, text, max_overlap_words=8):
+    """
+    Drops the words (or, for CJK, characters) at the start of `text` that repeat the end of
+    `previous_text`, which happens when consecutive audio windows overlap.
+
+    :return: `text` without the duplicated prefix.
+    """
+    previous_tokens = [token for token, _ in _overlap_tokens(previous_text)]
+    tokens = _overlap_tokens(text)
+    limit = min(max_overlap_words, len(previous_tokens), len(tokens))
+    for size in range(limit, 0, -1):
+        if previous_tokens[-size:] == [token for token, _ in tokens[:size]]:
+            return text[tokens[size - 1][1]:].lstrip(".,!?;:。，！？、 ")
+    return text
+
+
+def join_transcripts(texts):
+    """
+    Joins consecutive transcript pieces with a space, except between two CJK characters.
+    """
+    joined = ""
+    for text in texts:
+        if joined and text and not (_CJK_RE.match(joined[-1]) and _CJK_RE.match(text[0])):
+            joined += " "
+        joined += text
+    return joined
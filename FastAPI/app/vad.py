@@ -0,0 +1,208 @@
+# app/vad.py
+
+import numpy as np
+
+VAD_MODES = ("energy", "silero", "off")
+SPEECH_GAP_MS = 100  # Silence kept between voiced segments when the pauses are dropped
+
+
+class VADStats:
+    """
+    How much of a clip the VAD kept, reported per request, and where the kept audio came from.
+    """
+
+    def __init__(self, total_samples, segments, sample_rate, gap_ms=SPEECH_GAP_MS):
+        self.sample_rate = sample_rate
+        self.segments = segments
+        self.gap_samples = int(sample_rate * gap_ms / 1000)  # Silence extract_speech puts between segments
+        self.total_seconds = total_samples / sample_rate
+        self.voiced_seconds = sum(end - start for start, end in segments) / sample_rate
+        self.skipped_seconds = self.total_seconds - self.voiced_seconds
+
+    @property
+    def coverage(self):
+        return self.voiced_seconds / self.total_seconds if self.total_seconds else 0.0
+
+    def clip_time(self, seconds):
+        """
+        Maps a time in the voiced audio (the segments joined by extract_speech) to the same instant
+        in the original clip. Times inside an inserted gap map to the end of the segment before it.
+        """
+        if not self.segments:
+            return seconds
+        position = seconds * self.sample_rate
+        offset = 0
+        for start, end in self.segments:
+            if position < offset + end - start:
+                return (start + max(0.0, position - offset)) / self.sample_rate
+            offset += end - start
+            if position < offset + self.gap_samples:
+                return end / self.sample_rate
+            offset += self.gap_samples
+        return self.segments[-1][1] / self.sample_rate
+
+    def to_dict(self):
+        return {
+            "total_seconds": round(self.total_seconds, 3),
+            "voiced_seconds": round(self.voiced_seconds, 3),
+            "skipped_seconds": round(self.skipped_seconds, 3),
+            "segments": len(self.segments),
+        }
+
+
+def _merge_segments(segments, min_gap, min_length, padding, total):
+    """
+    Bridges gaps shorter than `min_gap`, drops segments shorter than `min_length` and pads the
+    rest by `padding` samples on both sides (all in samples).
+    """
+    merged = []
+    for start, end in segments:
+        if merged and start - merged[-1][1] < min_gap:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    padded = []
+    for start, end in merged:
+        if end - start < min_length:
+            continue
+        start, end = max(0, start - padding), min(total, end + padding)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((start, end))
+    return padded
+
+
+class EnergyVAD:
+    """
+    Frame-energy voice activity detector with an adaptive threshold.
+
+    A frame is voiced when its level exceeds both `threshold_db` and the clip's noise floor
+    (10th percentile of frame levels) plus `margin_db`, so quiet and loud recordings are handled
+    without per-device tuning.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=30, threshold_db=-50.0, margin_db=10.0,
+                 min_speech_ms=150, min_silence_ms=300, padding_ms=200):
+        self.sample_rate = sample_rate
+        self.frame_samples = int(sample_rate * frame_ms / 1000)
+        self.threshold_db = threshold_db
+        self.margin_db = margin_db
+        self.min_speech = int(sample_rate * min_speech_ms / 1000)
+        self.min_silence = int(sample_rate * min_silence_ms / 1000)
+        self.padding = int(sample_rate * padding_ms / 1000)
+
+    def frame_levels(self, audio):
+        """
+        Returns the RMS level of each full frame in dBFS.
+        """
+        n_frames = len(audio) // self.frame_samples
+        frames = audio[: n_frames * self.frame_samples].reshape(n_frames, self.frame_samples)
+        rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+        return 20.0 * np.log10(np.maximum(rms, 1e-10))
+
+    def speech_frames(self, audio):
+        levels = self.frame_levels(audio)
+        if not len(levels):
+            return levels.astype(bool)
+        noise_floor = np.percentile(levels, 10)
+        return levels > max(self.threshold_db, noise_floor + self.margin_db)
+
+    def segments(self, audio):
+        """
+        Returns voiced regions as (start, end) sample offsets.
+        """
+        voiced = self.speech_frames(audio)
+        if not voiced.any():
+            return []
+        # Rising/falling edges of the voiced mask give the run boundaries
+        edges = np.diff(np.concatenate([[0], voiced.astype(np.int8), [0]]))
+        starts = np.flatnonzero(edges == 1) * self.frame_samples
+        ends = np.minimum(np.flatnonzero(edges == -1) * self.frame_samples, len(audio))
+        return _merge_segments(zip(starts.tolist(), ends.tolist()), self.min_silence, self.min_speech, self.padding, len(audio))
+
+
+class SileroVAD:
+    """
+    Neural VAD backed by Silero (downloaded through torch.hub on first use).
+    """
+
+    def __init__(self, sample_rate=16000, threshold=0.5, min_speech_ms=250, min_silence_ms=300, padding_ms=200):
+        import torch
+
+        self._torch = torch
+        self.model, utils = torch.hub.load("snakers4/silero-vad", "silero_vad", trust_repo=True)
+        self._get_speech_timestamps = utils[0]
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.min_speech_ms = min_speech_ms
+        self.min_silence_ms = min_silence_ms
+        self.padding_ms = padding_ms
+
+    def segments(self, audio):
+        timestamps = self._get_speech_timestamps(
+            self._torch.from_numpy(audio),
+            self.model,
+            sampling_rate=self.sample_rate,
+            threshold=self.threshold,
+            min_speech_duration_ms=self.min_speech_ms,
+            min_silence_duration_ms=self.min_silence_ms,
+            speech_pad_ms=self.padding_ms,
+        )
+        return [(int(t["start"]), int(t["end"])) for t in timestamps]
+
+
+_vad_cache = {}
+
+
+def get_vad(mode="energy", sample_rate=16000):
+    """
+    Returns a VAD instance for `mode`, created once per process (workers in the DSP pool
+    each build their own). Falls back to EnergyVAD when Silero cannot be loaded.
+    """
+    if mode not in VAD_MODES:
+        raise ValueError(f"Unsupported VAD mode '{mode}', expected one of {VAD_MODES}.")
+    if mode == "off":
+        return None
+    key = (mode, sample_rate)
+    if key not in _vad_cache:
+        if mode == "silero":
+            try:
+                _vad_cache[key] = SileroVAD(sample_rate)
+            except Exception as e:
+                print(f"Silero VAD unavailable ({e}), falling back to energy VAD.")
+                _vad_cache[key] = EnergyVAD(sample_rate)
+        else:
+            _vad_cache[key] = EnergyVAD(sample_rate)
+    return _vad_cache[key]
+
+
+def extract_speech(audio, segments, sample_rate=16000, gap_ms=SPEECH_GAP_MS):
+    """
+    Concatenates the voiced segments, separated by short silences so words on either side of a
+    dropped pause do not run together.
+    """
+    if not segments:
+        return np.zeros(0, dtype=np.float32)
+    gap = np.zeros(int(sample_rate * gap_ms / 1000), dtype=np.float32)
+    pieces = []
+    for start, end in segments:
+        if pieces:
+            pieces.append(gap)
+        pieces.append(audio[start:end])
+    return np.concatenate(pieces).astype(np.float32, copy=False)
+
+
+def extract_silence(audio, segments):
+    """
+    Concatenates the regions outside the voiced segments (the clip's background noise).
+    """
+    pieces = []
+    previous_end = 0
+    for start, end in segments:
+        if start > previous_end:
+            pieces.append(audio[previous_end:start])
+        previous_end = end
+    if previous_end < len(audio):
+        pieces.append(audio[previous_end:])
+    return np.concatenate(pieces).astype(np.float32, copy=False) if pieces else np.zeros(0, dtype=np.float32)
@@ -0,0 +1,116 @@
+# app/word_timing.py
+
+import threading
+from contextlib import nullcontext
+
+import numpy as np
+import torch
+from whisper.audio import TOKENS_PER_SECOND
+from whisper.timing import WordTiming, dtw, median_filter, merge_punctuations
+from whisper.tokenizer import get_tokenizer
+
+try:
+    from whisper.model import disable_sdpa
+except ImportError:  # Older whisper releases always return attention weights
+    disable_sdpa = nullcontext
+
+PREPEND_PUNCTUATIONS = "\"'“¿([{-"
+APPEND_PUNCTUATIONS = "\"'.。,，!！?？:：”)]}、"
+
+# disable_sdpa() flips a class-wide switch; alignments hold this for the whole forward pass so
+# one thread restoring SDPA cannot strip the attention weights from another's
+_sdpa_lock = threading.Lock()
+
+
+def align_words(model, results, audio_features, num_frames, task="transcribe", medfilt_width=7):
+    """
+    Word-level timestamps for a batch of decoded clips, from the cross-attention of Whisper's
+    alignment heads (the method of whisper.timing.find_alignment). The decoded tokens are run
+    through the decoder once more, teacher-forced and batched, against the encoder features the
+    decode already computed, so neither the encoder nor the autoregressive decode is repeated.
+
+    :param results: DecodingResults of the batch.
+    :param audio_features: Encoder output the results were decoded from.
+    :param num_frames: Number of mel frames of real audio in each clip.
+    :return: One list of (word, start, end, probability) tuples per clip, times in seconds.
+    """
+    rows, layouts = [], []
+    for result in results:
+        tokenizer = get_tokenizer(
+            model.is_multilingual, num_languages=model.num_languages, language=result.language, task=task
+        )
+        text_tokens = [t for t in result.tokens if t < tokenizer.eot]
+        rows.append([*tokenizer.sot_sequence, tokenizer.no_timestamps, *text_tokens, tokenizer.eot])
+        layouts.append((tokenizer, text_tokens))
+    if not any(text_tokens for _, text_tokens in layouts):
+        return [[] for _ in results]
+
+    # Shorter rows are padded with EOT; attention is causal, so padding does not affect them
+    width = max(len(row) for row in rows)
+    tokens = torch.tensor(
+        [row + [layouts[i][0].eot] * (width - len(row)) for i, row in enumerate(rows)], device=audio_features.device
+    )
+
+    # The model is shared between threads: only keep attention weights from this thread's forward pass
+    caller = threading.get_ident()
+    qks = [None] * model.dims.n_text_layer
+
+    def capture(index):
+        def hook(_, inputs, outputs):
+            if threading.get_ident() == caller:
+                qks[index] = outputs[-1]
+        return hook
+
+    hooks = [block.cross_attn.register_forward_hook(capture(i)) for i, block in enumerate(model.decoder.blocks)]
+    try:
+        with _sdpa_lock, torch.no_grad(), disable_sdpa():
+            logits = model.decoder(tokens, audio_features)
+    finally:
+        for hook in hooks:
+            hook.remove()
+
+    heads = model.alignment_heads.indices().T
+    return [
+        _words(qks, heads, logits[i], i, len(rows[i]), tokenizer, text_tokens, num_frames[i], medfilt_width)
+        for i, (tokenizer, text_tokens) in enumerate(layouts)
+    ]
+
+
+def _words(qks, heads, logits, index, n_tokens, tokenizer, text_tokens, num_frames, medfilt_width):
+    if not text_tokens:
+        return []
+    sot_length = len(tokenizer.sot_sequence)
+    token_probs = logits[sot_length:sot_length + len(text_tokens), :tokenizer.eot].float().softmax(dim=-1)
+    text_token_probs = token_probs[np.arange(len(text_tokens)), text_tokens].tolist()
+
+    # heads * tokens * frames
+    weights = torch.stack([qks[layer][index, head, :n_tokens] for layer, head in heads])
+    weights = weights[:, :, : num_frames // 2].float().softmax(dim=-1)
+    std, mean = torch.std_mean(weights, dim=-2, keepdim=True, unbiased=False)
+    weights = median_filter((weights - mean) / std, medfilt_width)
+    matrix = weights.mean(axis=0)[sot_length:-1]
+    text_indices, time_indices = dtw(-matrix)
+
+    words, word_tokens = tokenizer.split_to_word_tokens(text_tokens + [tokenizer.eot])
+    if len(word_tokens) <= 1:
+        return []
+    word_boundaries = np.pad(np.cumsum([len(t) for t in word_tokens[:-1]]), (1, 0))
+    jumps = np.pad(np.diff(text_indices), (1, 0), constant_values=1).astype(bool)
+    jump_times = time_indices[jumps] / TOKENS_PER_SECOND
+    alignment = [
+        WordTiming(word, t, start, end, float(np.mean(text_token_probs[i:j])))
+        for word, t, start, end, i, j in zip(
+            words,
+            word_tokens,
+            jump_times[word_boundaries[:-1]],
+            jump_times[word_boundaries[1:]],
+            word_boundaries[:-1],
+            word_boundaries[1:],
+        )
+    ]
+    merge_punctuations(alignment, PREPEND_PUNCTUATIONS, APPEND_PUNCTUATIONS)
+    return [
+        (timing.word.strip(), float(timing.start), float(timing.end), timing.probability)
+        for timing in alignment
+        if timing.word.strip()
+    ]
@@ -0,0 +1,124 @@
+# app/worker_pools.py
+
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from .metrics import metrics
+
+
+class OverloadedError(Exception):
+    """
+    Raised when a stage's queue is full; mapped to an HTTP 503 with a Retry-After header.
+    """
+
+    def __init__(self, stage, retry_after):
+        super().__init__(f"The {stage} stage is at capacity, please retry in {retry_after}s.")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class Stage:
+    """
+    A bounded pipeline stage: at most `max_concurrency` jobs run at once and at most `max_queue`
+    more may wait. Anything beyond that is rejected immediately with OverloadedError instead of
+    piling up behind the event loop.
+    """
+
+    def __init__(self, name, executor, max_concurrency, max_queue, retry_after=2):
+        self.name = name
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._running = 0
+
+    @property
+    def queue_depth(self):
+        return self._waiting
+
+    @property
+    def running(self):
+        return self._running
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Admits the caller into the stage, waiting for a free slot if the queue has room.
+        """
+        if self._waiting >= self.max_queue and self._semaphore.locked():
+            metrics.increment(f"stage.{self.name}.rejected")
+            raise OverloadedError(self.name, self.retry_after)
+
+        self._waiting += 1
+        self._update_gauges()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._running += 1
+        self._update_gauges()
+        try:
+            yield
+        finally:
+            self._running -= 1
+            self._semaphore.release()
+            self._update_gauges()
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Runs a blocking callable on the stage's executor once a slot is free.
+        """
+        loop = asyncio.get_running_loop()
+        async with self.slot():
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    def _update_gauges(self):
+        metrics.set_gauge(f"stage.{self.name}.queued", self._waiting)
+        metrics.set_gauge(f"stage.{self.name}.running", self._running)
+
+
+class WorkerPools:
+    """
+    Executors for CPU-bound work kept off the event loop:
+
+    - dsp: process pool for pure-Python/NumPy preprocessing (decode, normalize, denoise).
+    - asr: thread pool for Whisper, whose torch kernels release the GIL.
+    - llm: admission for chat-completion calls, which are awaited on the shared async client;
+      its threads only run the remaining blocking LLM work (summary generation).
+    """
+
+    def __init__(
+        self,
+        dsp_workers=None,
+        dsp_max_queue=16,
+        asr_threads=2,
+        asr_max_concurrency=16,
+        asr_max_queue=32,
+        llm_threads=16,
+        llm_max_concurrency=64,
+        llm_max_queue=64,
+        retry_after=2,
+    ):
+        dsp_workers = dsp_workers if dsp_workers else max(1, (os.cpu_count() or 2) // 2)
+        # Spawned (not forked) workers: forking a process that already holds torch threads can deadlock
+        self.dsp_executor = ProcessPoolExecutor(
+            max_workers=dsp_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.asr_executor = ThreadPoolExecutor(max_workers=asr_threads, thread_name_prefix="asr")
+        self.llm_executor = ThreadPoolExecutor(max_workers=llm_threads, thread_name_prefix="llm")
+
+        self.dsp = Stage("dsp", self.dsp_executor, dsp_workers, dsp_max_queue, retry_after)
+        self.asr = Stage("asr", self.asr_executor, asr_max_concurrency, asr_max_queue, retry_after)
+        self.llm = Stage("llm", self.llm_executor, llm_max_concurrency, llm_max_queue, retry_after)
+
+    def shutdown(self):
+        self.dsp_executor.shutdown(wait=False, cancel_futures=True)
+        self.asr_executor.shutdown(wait=False, cancel_futures=True)
+        self.llm_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,73 @@
+# benchmarks/bench_chat_history.py
+"""
+Cost of preparing the API messages for each turn of a long LLMChat conversation, without any
+model calls: replies are recorded directly.
+
+Compares re-transforming the whole history every turn (the former prepare_history_for_api)
+with the incrementally maintained message log, sending either the full history or a bounded
+context window (extractive summaries, so no summarization calls are made).
+
+    python -m benchmarks.bench_chat_history --turns 200
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from app.chat_model import LLMChat
+from .common import print_table
+
+
+def build_chat(max_context_tokens=None):
+    chat = LLMChat(api_key="benchmark", max_context_tokens=max_context_tokens)
+    if chat.context_window is not None:
+        chat.context_window.summarize = None
+    return chat
+
+
+def add_turn(chat, turn):
+    chat.append_user_message(f"Turn {turn}: 司机说前面堵车了，我们要不要换一条路走？大概还要二十分钟。", "TARGET")
+    chat.record_reply(f"[USER] The driver says there is traffic ahead (turn {turn}); should we take another route?")
+
+
+async def run(turns, report_every, max_context_tokens):
+    full, incremental = build_chat(), build_chat()
+    windowed = build_chat(max_context_tokens)
+    totals = [0.0, 0.0, 0.0]
+    rows = []
+    for turn in range(1, turns + 1):
+        for chat in (full, incremental, windowed):
+            add_turn(chat, turn)
+
+        start = time.perf_counter()
+        full.prepare_history_for_api(list(full.history))
+        seconds = [time.perf_counter() - start]
+        for chat in (incremental, windowed):
+            start = time.perf_counter()
+            await chat.prepare_messages()
+            seconds.append(time.perf_counter() - start)
+
+        totals = [total + s for total, s in zip(totals, seconds)]
+        if turn == 1 or turn % report_every == 0:
+            rows.append([turn, len(full.history), *(f"{s * 1e6:.0f}" for s in seconds)])
+    rows.append(["total", len(full.history), *(f"{total * 1e6:.0f}" for total in totals)])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--report-every", type=int, default=25)
+    parser.add_argument("--max-context-tokens", type=int, default=3000)
+    args = parser.parse_args()
+
+    # LLMChat logs every message; keep that out of the table (and the timings comparable)
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = asyncio.run(run(args.turns, args.report_every, args.max_context_tokens))
+    print_table(["turn", "history", "full_rebuild_us", "incremental_us", "windowed_us"], rows)
+
+
+if __name__ == "__main__":
+    main()
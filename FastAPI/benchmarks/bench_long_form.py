@@ -0,0 +1,71 @@
+# benchmarks/bench_long_form.py
+"""
+Compares long-form transcription strategies on a recording built by concatenating the bundled
+Etc/testing*.wav clips (`--repeat` times): Whisper's sequential windowed transcribe versus
+pause-aligned chunks decoded as batches through BatchTranscriber (the path the server uses for
+long_form="parallel"), one batch at a time on the default executor ("chunked-batch") or several
+at once on a `--threads` pool ("chunked-batch+pool"). Reports wall time, real-time factor and the WER of the chunked
+transcript measured against the sequential one.
+
+    python -m benchmarks.bench_long_form --model base --repeat 4
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.batch_transcriber import BatchTranscriber
+from app.long_form import plan_chunks
+from app.transcription_handler import TranscriptionHandler
+from .common import load_clips, print_table, word_error_rate
+
+
+async def transcribe_chunked(handler, recording, batch_size, executor):
+    transcriber = BatchTranscriber(handler, max_batch_size=batch_size, executor=executor, long_form="parallel")
+    await transcriber.start()
+    try:
+        return await transcriber.transcribe(recording)
+    finally:
+        await transcriber.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--repeat", type=int, default=4, help="How many times the clip set is concatenated")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=2, help="Executor threads, and so concurrent batches, for chunked-batch+pool")
+    args = parser.parse_args()
+
+    silence = np.zeros(8000, dtype=np.float32)
+    pieces = []
+    for _ in range(args.repeat):
+        for _, audio in load_clips():
+            pieces += [audio, silence]
+    recording = np.concatenate(pieces)
+    duration = len(recording) / 16000
+
+    handler = TranscriptionHandler(model_name=args.model)
+    handler.warm_up()
+    print(f"Recording: {duration:.1f}s, {len(plan_chunks(recording))} chunks")
+
+    started_at = time.perf_counter()
+    sequential_text = handler.transcribe(recording).strip()
+    sequential_seconds = time.perf_counter() - started_at
+
+    rows = [["sequential", f"{sequential_seconds:.2f}", f"{sequential_seconds / duration:.3f}", "-"]]
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        for name, pool in (("chunked-batch", None), ("chunked-batch+pool", executor)):
+            started_at = time.perf_counter()
+            text = asyncio.run(transcribe_chunked(handler, recording, args.batch_size, pool)).text
+            seconds = time.perf_counter() - started_at
+            rows.append([name, f"{seconds:.2f}", f"{seconds / duration:.3f}", f"{word_error_rate(sequential_text, text):.3f}"])
+
+    print_table(["strategy", "seconds", "rtf", "wer_vs_sequential"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# benchmarks/bench_noise_reduction.py
+"""
+Compares noise-reduction strategies on the bundled Etc/testing*.wav clips: CPU time per clip
+and the WER of the resulting Whisper transcript.
+
+WER is measured against --references (JSON of clip name -> transcript) when given, otherwise
+against the transcript of the un-denoised ('bypass') audio.
+
+    python -m benchmarks.bench_noise_reduction --model base --repeat 5
+"""
+
+import argparse
+
+from app.audio_handler import AudioHandler
+from app.noise_reduction import NOISE_STRATEGIES
+from .common import load_clips, load_references, print_table, time_call, word_error_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="base", help="Whisper model used to score transcripts")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions per strategy")
+    parser.add_argument("--jobs", type=int, default=1, help="Threads for chunked stationary gating")
+    parser.add_argument("--references", help="JSON file mapping clip names to reference transcripts")
+    parser.add_argument("--no-asr", action="store_true", help="Only measure CPU time")
+    args = parser.parse_args()
+
+    references = load_references(args.references)
+    transcriber = None
+    if not args.no_asr:
+        from app.transcription_handler import TranscriptionHandler
+
+        transcriber = TranscriptionHandler(model_name=args.model)
+
+    rows = []
+    for name, audio in load_clips():
+        handlers = {s: AudioHandler(noise_strategy=s, noise_n_jobs=args.jobs) for s in NOISE_STRATEGIES}
+        normalized = handlers["bypass"].normalize(audio)
+        transcripts = {}
+        for strategy, handler in handlers.items():
+            denoised, seconds = time_call(handler.denoise, normalized, repeat=args.repeat)
+            transcripts[strategy] = transcriber.transcribe(denoised).strip() if transcriber else ""
+            rows.append([name, strategy, f"{seconds * 1000:.1f}", f"{seconds / (len(audio) / 16000):.4f}"])
+
+        reference = references.get(name, transcripts["bypass"])
+        for row in rows[-len(handlers):]:
+            row.append(f"{word_error_rate(reference, transcripts[row[1]]):.3f}" if transcriber else "-")
+            row.append(transcripts[row[1]][:60])
+
+    print_table(["clip", "strategy", "cpu_ms", "rtf", "wer", "transcript"], rows)
+
+
+if __name__ == "__main__":
+    main()
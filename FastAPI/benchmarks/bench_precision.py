@@ -0,0 +1,59 @@
+# benchmarks/bench_precision.py
+"""
+Accuracy/latency comparison of Whisper precision modes over the bundled Etc/testing*.wav clips.
+
+For each dtype, the model is loaded through the registry, warmed up, and every clip is decoded
+`--repeat` times through TranscriptionHandler.decode_batch (for bfloat16, the encoder, decoder
+and language ID all run under bf16 autocast). The report shows the precision mode, load time, memory,
+median latency per clip and the WER of each mode against --references (JSON of clip name ->
+transcript) or, by default, against the float32 transcripts.
+
+    python -m benchmarks.bench_precision --model small --dtypes float32,bfloat16,int8
+"""
+
+import argparse
+
+from app.model_registry import ModelRegistry
+from app.transcription_handler import TranscriptionHandler
+from .common import load_clips, load_references, print_table, time_call, word_error_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--dtypes", default="float32,bfloat16,int8")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--references", help="JSON file mapping clip names to reference transcripts")
+    args = parser.parse_args()
+
+    clips = load_clips()
+    references = load_references(args.references)
+    rows = []
+    for dtype in args.dtypes.split(","):
+        # A fresh registry per mode so each measurement starts from an unloaded model
+        handler = TranscriptionHandler(model_name=args.model, device=args.device, dtype=dtype, registry=ModelRegistry())
+        handler.warm_up()
+        loaded = handler.loaded_model
+        for name, audio in clips:
+            results, seconds = time_call(handler.decode_batch, [audio], repeat=args.repeat)
+            text = results[0].text.strip()
+            if dtype == "float32" and name not in references:
+                references[name] = text
+            rows.append([
+                loaded.dtype,
+                loaded.precision,
+                name,
+                f"{loaded.load_seconds:.1f}",
+                f"{loaded.param_bytes / 2**20:.0f}",
+                f"{(loaded.rss_delta_bytes or 0) / 2**20:.0f}",
+                f"{seconds * 1000:.0f}",
+                f"{word_error_rate(references.get(name, text), text):.3f}",
+                text[:50],
+            ])
+
+    print_table(["dtype", "precision", "clip", "load_s", "param_mb", "rss_mb", "latency_ms", "wer", "transcript"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/bench_speaker_side.py
+"""
+Latency of the speaker-side classification stage over the bundled Etc/testing*.wav clips.
+
+Every clip is encoded once and Whisper's language-ID step is timed on those encoder features,
+which is the extra work decode_batch does when language probabilities are requested; a full
+hinted decode is timed for comparison. The classifier itself is then timed on the resulting
+TranscriptionResult.
+
+    python -m benchmarks.bench_speaker_side --model small --user-language en --target-language zh
+"""
+
+import argparse
+
+from app.speaker_side import SpeakerSideClassifier
+from app.transcription_handler import TranscriptionHandler
+from app.transcription_result import TranscriptionResult
+from .common import load_clips, print_table, time_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--dtype", default=None)
+    parser.add_argument("--user-language", default="en")
+    parser.add_argument("--target-language", default="zh")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    handler = TranscriptionHandler(model_name=args.model, device=args.device, dtype=args.dtype)
+    handler.warm_up()
+    classifier = SpeakerSideClassifier(args.user_language, args.target_language)
+    # Decode in the user's language, as a hinted turn would
+    options = handler.default_options(language=args.user_language)
+
+    rows = []
+    for name, audio in load_clips():
+        features = handler.encode_batch([audio])
+        _, language_id_seconds = time_call(handler.model.detect_language, features, repeat=args.repeat)
+        results, decode_seconds = time_call(handler.decode_batch, [audio], options, True, repeat=args.repeat)
+        result = TranscriptionResult.from_decoding(results[0])
+        speaker, classify_seconds = time_call(classifier.classify, result, repeat=args.repeat)
+        rows.append([
+            name,
+            f"{decode_seconds * 1000:.0f}",
+            f"{language_id_seconds * 1000:.1f}",
+            f"{classify_seconds * 1000:.3f}",
+            max(result.language_probs, key=result.language_probs.get),
+            speaker.side,
+            f"{speaker.confidence:.2f}",
+        ])
+
+    print_table(["clip", "decode_ms", "language_id_ms", "classify_ms", "language", "side", "confidence"], rows)
+
+
+if __name__ == "__main__":
+    main()
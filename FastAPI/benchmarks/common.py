@@ -0,0 +1,93 @@
+# benchmarks/common.py
+"""
+Shared helpers for the benchmark scripts. Run benchmarks from the FastAPI directory, e.g.
+`python -m benchmarks.bench_noise_reduction`, so that the `app` package is importable.
+"""
+
+import glob
+import json
+import os
+import statistics
+import time
+from math import gcd
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
+
+ETC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "Etc")
+
+
+def load_clip(path, sample_rate=16000):
+    """
+    Loads a WAV file as mono float32 at `sample_rate`.
+    """
+    audio, rate = sf.read(path, dtype="float32", always_2d=True)
+    audio = audio.mean(axis=1)
+    if rate != sample_rate:
+        divisor = gcd(rate, sample_rate)
+        audio = resample_poly(audio, sample_rate // divisor, rate // divisor).astype(np.float32)
+    return audio
+
+
+def load_clips(pattern="testing*.wav", sample_rate=16000):
+    """
+    Returns [(name, audio)] for the bundled test clips in Etc/.
+    """
+    paths = sorted(glob.glob(os.path.join(ETC_DIR, pattern)))
+    return [(os.path.basename(path), load_clip(path, sample_rate)) for path in paths]
+
+
+def load_references(path):
+    """
+    Loads reference transcripts from a JSON file mapping clip names to text.
+    """
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _tokens(text):
+    # Scripts without spaces (Chinese, Japanese) are scored per character
+    if any("぀" <= ch <= "鿿" for ch in text):
+        return [ch for ch in text if not ch.isspace() and ch not in "，。！？、,.!?"]
+    return [w.strip(".,!?;:").lower() for w in text.split() if w.strip(".,!?;:")]
+
+
+def word_error_rate(reference, hypothesis):
+    """
+    Levenshtein distance between token sequences divided by the reference length (character
+    error rate for CJK text).
+    """
+    ref, hyp = _tokens(reference), _tokens(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def time_call(fn, *args, repeat=3, **kwargs):
+    """
+    Calls fn `repeat` times and returns (last result, median seconds).
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return result, statistics.median(timings)
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(row[i])) for row in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)))
@@ -0,0 +1,62 @@
+# tests/test_response_cache.py
+
+import asyncio
+import threading
+import time
+
+from app.response_cache import ResponseCache
+
+
+class SlowConnection:
+    """
+    SQLite connection whose commits stall until released, like a write waiting on fsync.
+    """
+
+    def __init__(self, connection, started, release):
+        self.connection = connection
+        self.started = started
+        self.release = release
+
+    def execute(self, *args):
+        return self.connection.execute(*args)
+
+    def commit(self):
+        self.started.set()
+        self.release.wait(2.0)  # Bounded, so a regression fails instead of hanging
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def test_memory_hits_do_not_wait_for_sqlite_writes(tmp_path):
+    async def scenario():
+        cache = ResponseCache(max_entries=8, ttl_seconds=60, sqlite_path=str(tmp_path / "responses.db"))
+        await cache.aput("cached", "[USER] hello")
+        started, release = threading.Event(), threading.Event()
+        cache._db = SlowConnection(cache._db, started, release)
+
+        write = asyncio.create_task(cache.aput("slow", "[TARGET] 你好"))
+        assert await asyncio.to_thread(started.wait, 2.0)
+        started_at = time.perf_counter()
+        reply = await cache.aget("cached")
+        elapsed = time.perf_counter() - started_at
+        write_pending = not write.done()
+        release.set()
+        await write
+        return reply, elapsed, write_pending
+
+    reply, elapsed, write_pending = asyncio.run(scenario())
+    assert reply == "[USER] hello"
+    assert write_pending
+    assert elapsed < 0.5
+
+
+def test_sqlite_tier_survives_a_new_instance(tmp_path):
+    path = str(tmp_path / "responses.db")
+
+    async def scenario():
+        await ResponseCache(max_entries=8, ttl_seconds=60, sqlite_path=path).aput("key", "[USER] hi")
+        return await ResponseCache(max_entries=8, ttl_seconds=60, sqlite_path=path).aget("key")
+
+    assert asyncio.run(scenario()) == "[USER] hi"
@@ -0,0 +1,93 @@
+# tests/test_upload_ingest.py
+
+import asyncio
+import json
+
+from fastapi import FastAPI, File, UploadFile
+
+from app.upload_ingest import UploadLimitMiddleware
+
+LIMIT = 256 * 1024
+CHUNK = 16 * 1024
+BOUNDARY = b"upload-limit-test"
+
+
+def build_app():
+    app = FastAPI()
+    spooled = []
+
+    @app.post("/process_audio/{session_id}")
+    async def process_audio(session_id: str, file: UploadFile = File(...)):
+        spooled.append(len(await file.read()))
+        return {"bytes": spooled[-1]}
+
+    app.add_middleware(UploadLimitMiddleware, max_body_bytes=LIMIT)
+    return app, spooled
+
+
+def multipart_body(size):
+    return (
+        b"--" + BOUNDARY + b"\r\n"
+        b'Content-Disposition: form-data; name="file"; filename="clip.wav"\r\n'
+        b"Content-Type: audio/wav\r\n\r\n" + b"\0" * size + b"\r\n--" + BOUNDARY + b"--\r\n"
+    )
+
+
+def post(app, body, content_length=True):
+    """
+    Sends `body` in CHUNK-sized messages and records how much of it the app pulled.
+
+    :return: Tuple of (status, JSON response, bytes received by the app).
+    """
+    headers = [(b"content-type", b"multipart/form-data; boundary=" + BOUNDARY)]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/process_audio/session", "raw_path": b"/process_audio/session", "root_path": "", "query_string": b"",
+        "headers": headers, "client": ("127.0.0.1", 1234), "server": ("127.0.0.1", 80),
+    }
+    chunks = [body[i:i + CHUNK] for i in range(0, len(body), CHUNK)]
+    pulled = 0
+    messages = []
+
+    async def receive():
+        nonlocal pulled
+        if not chunks:
+            return {"type": "http.disconnect"}
+        chunk = chunks.pop(0)
+        pulled += len(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    status = next(m["status"] for m in messages if m["type"] == "http.response.start")
+    payload = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body")
+    return status, json.loads(payload), pulled
+
+
+def test_upload_within_limit_is_accepted():
+    app, spooled = build_app()
+    status, response, _ = post(app, multipart_body(LIMIT // 2))
+    assert status == 200
+    assert response == {"bytes": LIMIT // 2}
+
+
+def test_declared_oversized_upload_is_rejected_before_reading():
+    app, spooled = build_app()
+    status, _, pulled = post(app, multipart_body(LIMIT * 4))
+    assert status == 413
+    assert pulled == 0
+    assert spooled == []
+
+
+def test_streamed_oversized_upload_is_rejected_while_arriving():
+    app, spooled = build_app()
+    body = multipart_body(LIMIT * 4)
+    status, response, pulled = post(app, body, content_length=False)
+    assert status == 413
+    assert "limit" in response["detail"]
+    assert pulled <= LIMIT + CHUNK < len(body)
+    assert spooled == []
@@ -0,0 +1,150 @@
+# tools/fake_openai_server.py
+"""
+Minimal OpenAI-compatible chat completions server for exercising LLMChat, /send_message and
+/send_message_stream without network access or API keys. Standard library only.
+
+POST /v1/chat/completions answers with --reply (default: the last user message, addressed to the
+target), either as one completion or, with "stream": true, as server-sent chunks of
+--chunk-chars characters every --delay-ms milliseconds. Usage is reported with an estimate of
+four characters per token.
+
+    python -m tools.fake_openai_server --port 8001
+    LLM_BASE_URL=http://127.0.0.1:8001/v1 uvicorn app.main:app
+"""
+
+import argparse
+import json
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so clients can pool connections
+    reply = None
+    chunk_chars = 4
+    delay = 0.02
+    first_token_delay = 0.1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            return self._send_json({"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model"}]})
+        self._send_json({"error": {"message": "Not found"}}, status=404)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send_json({"error": {"message": "Not found"}}, status=404)
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        messages = request.get("messages", [])
+        reply = self.reply if self.reply is not None else self._default_reply(messages)
+        usage = {
+            "prompt_tokens": sum(estimate_tokens(m.get("content") or "") + 4 for m in messages),
+            "completion_tokens": estimate_tokens(reply),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = request.get("model", "gpt-4o-mini")
+
+        if not request.get("stream"):
+            time.sleep(self.first_token_delay + self.delay * (len(reply) // self.chunk_chars))
+            return self._send_json({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            time.sleep(self.first_token_delay)
+            pieces = [reply[i:i + self.chunk_chars] for i in range(0, len(reply), self.chunk_chars)]
+            for index, piece in enumerate(pieces):
+                delta = {"role": "assistant", "content": piece} if index == 0 else {"content": piece}
+                self._send_chunk(completion_id, model, [{"index": 0, "delta": delta, "finish_reason": None}])
+                time.sleep(self.delay)
+            self._send_chunk(completion_id, model, [{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if (request.get("stream_options") or {}).get("include_usage"):
+                self._send_chunk(completion_id, model, [], usage)
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading (a cancelled stream)
+            self.close_connection = True
+
+    def _default_reply(self, messages):
+        user_messages = [m.get("content") or "" for m in messages if m.get("role") == "user"]
+        return f"[TARGET] {user_messages[-1] if user_messages else 'Hello.'}"
+
+    def _send_chunk(self, completion_id, model, choices, usage=None):
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": choices,
+        }
+        if usage is not None:
+            chunk["usage"] = usage
+        self._write_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def create_server(host="127.0.0.1", port=8001, reply=None, chunk_chars=4, delay_ms=20, first_token_ms=100):
+    """
+    Builds the server without starting it (serve_forever() in a thread for tests).
+    """
+    handler = type("ConfiguredFakeOpenAIHandler", (FakeOpenAIHandler,), {
+        "reply": reply,
+        "chunk_chars": chunk_chars,
+        "delay": delay_ms / 1000.0,
+        "first_token_delay": first_token_ms / 1000.0,
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--reply", help="Fixed reply, e.g. '[USER] The driver agreed.'")
+    parser.add_argument("--chunk-chars", type=int, default=4)
+    parser.add_argument("--delay-ms", type=float, default=20)
+    parser.add_argument("--first-token-ms", type=float, default=100)
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.reply, args.chunk_chars, args.delay_ms, args.first_token_ms)
+    print(f"Fake OpenAI server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
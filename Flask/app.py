@@ -24,6 +24,8 @@ UPLOAD_FOLDER = 'uploads'
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Werkzeug rejects larger request bodies with 413 before they are read
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_BYTES', 50 * 1024 * 1024))
 
 # Allowed audio extensions
 ALLOWED_EXTENSIONS = {'wav', 'mp3', 'm4a'}
@@ -109,7 +111,9 @@ def process_audio(session_id):
         return jsonify({'error': 'No selected file.'}), 400
 
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
+        # Unique name per upload so concurrent requests never overwrite each other's files;
+        # FileStorage.save streams the body to disk in chunks
+        filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         file.save(filepath)
 